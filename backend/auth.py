@@ -2,21 +2,26 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
-from database import get_db
 import models
+import passwords
+import hmac
 import os
+import threading
+import time
 
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Bearer token for the metrics scraper (admins' own tokens work too); unset = admins only
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing (see passwords.py for the async, pooled versions)
+pwd_context = passwords.pwd_context
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
@@ -40,39 +45,111 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> models.User:
-    """Get current user from JWT token"""
+class Principal:
+    """
+    The authenticated user, built from the token claims alone.
+    Has the attributes endpoints use from models.User (id, email, role,
+    is_active) without a users-table lookup.
+    """
+    __slots__ = ("id", "email", "role", "is_active", "issued_at")
+
+    def __init__(self, id: int, email: str, role: str, is_active: bool, issued_at: float):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.is_active = is_active
+        self.issued_at = issued_at
+
+def create_user_token(user: models.User) -> str:
+    """Access token for a user, carrying everything Principal needs"""
+    return create_access_token(
+        data={
+            "sub": user.email,
+            "uid": user.id,
+            "role": user.role,
+            "active": bool(user.is_active),
+            "iat": time.time(),
+        },
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+# Token revocation: user id -> time before which that user's tokens are no
+# longer accepted, kept in the token_revocations table. Every worker holds a
+# copy, reloaded when the table's catalog version moves (see
+# catalogversion), so a revocation reaches the other workers within a poll.
+# Rows older than a token lifetime can't match anything and are pruned.
+_revoked_before = {}
+_revocation_lock = threading.Lock()
+
+def revoke_user_tokens(db: Session, user_id: int):
+    """
+    Invalidate every token issued to a user so far (role change, deletion),
+    in the caller's transaction: commit it afterwards.
+    """
+    now = time.time()
+    db.execute(delete(models.TokenRevocation).where(
+        models.TokenRevocation.revoked_before < now - ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    ))
+    db.merge(models.TokenRevocation(user_id=user_id, revoked_before=now))
+    # This worker doesn't wait for the next poll
+    with _revocation_lock:
+        _revoked_before[user_id] = now
+
+def load_revocations(bind):
+    """(Re)load the revocations that can still match a token"""
+    horizon = time.time() - ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    with Session(bind) as db:
+        rows = db.execute(
+            select(models.TokenRevocation.user_id, models.TokenRevocation.revoked_before)
+            .where(models.TokenRevocation.revoked_before >= horizon)
+        ).all()
+    global _revoked_before
+    with _revocation_lock:
+        _revoked_before = dict(rows)
+
+def is_revoked(principal: Principal) -> bool:
+    revoked_before = _revoked_before.get(principal.id)
+    return revoked_before is not None and principal.issued_at <= revoked_before
+
+def decode_principal(token: str) -> Optional[Principal]:
+    """Principal for a valid, unrevoked token, else None"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        principal = Principal(
+            id=int(payload["uid"]),
+            email=payload["sub"],
+            role=payload["role"],
+            is_active=bool(payload["active"]),
+            issued_at=float(payload["iat"]),
+        )
+    except (JWTError, KeyError, TypeError, ValueError):
+        return None
+    if is_revoked(principal):
+        return None
+    return principal
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """Get current user from JWT token (no database access)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if user is None:
+    principal = decode_principal(token)
+    if principal is None:
         raise credentials_exception
-    return user
+    return principal
 
 def get_current_active_user(
-    current_user: models.User = Depends(get_current_user)
-) -> models.User:
+    current_user: Principal = Depends(get_current_user)
+) -> Principal:
     """Ensure user is active"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 # Role checking functions
-def require_owner(current_user: models.User = Depends(get_current_active_user)) -> models.User:
+def require_owner(current_user: Principal = Depends(get_current_active_user)) -> Principal:
     """Require owner or admin role"""
     if current_user.role not in ['owner', 'admin']:
         raise HTTPException(
@@ -81,11 +158,17 @@ def require_owner(current_user: models.User = Depends(get_current_active_user))
         )
     return current_user
 
-def require_admin(current_user: models.User = Depends(get_current_active_user)) -> models.User:
+def require_admin(current_user: Principal = Depends(get_current_active_user)) -> Principal:
     """Require admin role"""
     if current_user.role != 'admin':
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied. Admin role required."
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+def require_metrics_access(token: str = Depends(oauth2_scheme)) -> None:
+    """Require the METRICS_TOKEN bearer token or an active admin"""
+    if METRICS_TOKEN and hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        return
+    require_admin(get_current_active_user(get_current_user(token)))
@@ -0,0 +1,186 @@
+# backend/cache.py
+import inspect
+import os
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+import catalogversion
+import database
+
+# Max number of serialized responses kept in memory
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "1024"))
+
+
+class CatalogCache:
+    """
+    Bounded LRU of serialized catalog responses (JSON bytes).
+
+    Every entry is tagged with the cars counter of catalogversion it was
+    built at, so every worker gives the same ETag for the same catalog
+    state and a revalidation can land on any of them. The counter comes
+    from catalogversion.watcher (other workers' writes, via set_version())
+    and is read back after this process's own writes; the ETag itself is
+    known without touching the database.
+
+    Without counters (a dialect catalogversion doesn't support) the tags
+    fall back to per-process versions: list-like entries follow the list
+    version, single-car entries that car's own version.
+
+    Right after a change, a body read from a replica may predate it, so
+    it is served but not kept (see cached_response).
+    """
+
+    def __init__(self, max_entries: int = CATALOG_CACHE_SIZE):
+        self.max_entries = max_entries
+        # Distinguishes ETags of different processes/restarts
+        self.epoch = uuid.uuid4().hex[:8]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._list_version = 0
+        self._car_versions = {}
+        self._generation = 0  # bumped by invalidate_all(), part of every fallback ETag
+        self.version = None  # catalogversion cars counter, None without counters
+        self.changed_at = float("-inf")  # time.monotonic() of the last invalidation
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def etag(self, key: tuple) -> str:
+        """Strong ETag for a key at the current catalog version"""
+        if self.version is not None:
+            if key[0] == "car":
+                return f'"v{self.version}-c{key[1]}"'
+            return f'"v{self.version}-l{zlib.crc32(repr(key).encode()):08x}"'
+        if key[0] == "car":
+            car_id = key[1]
+            return f'"{self.epoch}-g{self._generation}-c{car_id}.{self._car_versions.get(car_id, 0)}"'
+        digest = zlib.crc32(repr(key).encode())
+        return f'"{self.epoch}-g{self._generation}-l{self._list_version}-{digest:08x}"'
+
+    def get(self, key: tuple, etag: str):
+        """Cached body for key, or None if missing or built for an older version"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: tuple, etag: str, body: bytes):
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def invalidate_lists(self):
+        """A car was added: every list may change, single cars don't"""
+        with self._lock:
+            self._list_version += 1
+            self.changed_at = time.monotonic()
+            for key in [key for key in self._entries if key[0] != "car"]:
+                del self._entries[key]
+        self._catch_up()
+
+    def invalidate_car(self, car_id: int):
+        """A car was updated or deleted: its own entry and every list"""
+        with self._lock:
+            self._car_versions[car_id] = self._car_versions.get(car_id, 0) + 1
+            self._entries.pop(("car", car_id), None)
+        self.invalidate_lists()
+
+    def invalidate_all(self):
+        """Bulk change (seed, import) or another worker's write: drop everything"""
+        with self._lock:
+            self._generation += 1
+            self.changed_at = time.monotonic()
+            self._entries.clear()
+        self._catch_up()
+
+    def set_version(self, version: int):
+        """The cars counter moved (any worker's write): drop what was built before"""
+        with self._lock:
+            if version is None or (self.version is not None and version <= self.version):
+                return
+            self.version = version
+            self._generation += 1
+            self.changed_at = time.monotonic()
+            self._entries.clear()
+
+    def _catch_up(self):
+        """After this process's own write: take the counter it moved now, not at the next poll"""
+        if self.version is not None:
+            self.set_version(catalogversion.current(database.engine))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": sum(len(body) for _, body in self._entries.values()),
+                "version": self.version,
+                "list_version": self._list_version,
+                "generation": self._generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+            }
+
+
+catalog_cache = CatalogCache()
+
+
+def _replica_may_lag() -> bool:
+    """This request reads from a replica that may not have the last change yet"""
+    return (bool(database.replica_engines) and not database.read_from_primary.get()
+            and time.monotonic() - catalog_cache.changed_at < database.REPLICA_STICKY_SECONDS)
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return etag in [tag.strip() for tag in header.split(",")]
+
+
+async def cached_response(request: Request, key: tuple, build) -> Response:
+    """
+    Serve a catalog read from the cache.
+    `build` is only called on a miss and must return (or be a coroutine
+    function returning) the JSON body as bytes.
+    A matching If-None-Match is answered with 304 before any database work.
+    """
+    etag = catalog_cache.etag(key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if _etag_matches(request, etag):
+        catalog_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+
+    body = catalog_cache.get(key, etag)
+    if body is None:
+        lagging = _replica_may_lag()
+        body = build()
+        if inspect.isawaitable(body):
+            body = await body
+        if lagging:
+            # Neither cached nor tagged: a stale body must not be revalidated later
+            return Response(content=body, media_type="application/json",
+                            headers={"Cache-Control": "no-cache"})
+        catalog_cache.put(key, etag, body)
+
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,147 @@
+# backend/catalogversion.py
+# Counters in the database bumped by triggers on every write to the tracked
+# tables, from any process and any write path (ORM, bulk import, COPY, raw
+# SQL). Workers poll them and reload their in-memory copies when one moves.
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from log import get_logger
+
+logger = get_logger("catalogversion")
+
+# Seconds between two polls; other workers' writes show up within this
+CATALOG_VERSION_POLL_SECONDS = float(os.getenv("CATALOG_VERSION_POLL_SECONDS", "2"))
+
+TRACKED = ("cars", "favorites", "test_drives", "token_revocations")
+
+_TABLE = [
+    "CREATE TABLE IF NOT EXISTS catalog_version (name VARCHAR(50) PRIMARY KEY, version BIGINT NOT NULL)",
+    "INSERT INTO catalog_version (name, version) VALUES "
+    + ", ".join(f"('{table}', 0)" for table in TRACKED) + " ON CONFLICT DO NOTHING",
+]
+
+# One bump per statement (COPY and TRUNCATE included)
+POSTGRES_DDL = _TABLE + [
+    "DROP FUNCTION IF EXISTS bump_cars_version() CASCADE",
+    """
+    CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+    BEGIN
+        UPDATE catalog_version SET version = version + 1 WHERE name = TG_ARGV[0];
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+] + [
+    statement
+    for table in TRACKED
+    for statement in (
+        f"DROP TRIGGER IF EXISTS {table}_version ON {table}",
+        f"""
+        CREATE TRIGGER {table}_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version('{table}')
+        """,
+    )
+]
+
+# SQLite only has row triggers: one bump per row
+SQLITE_DDL = _TABLE + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+        UPDATE catalog_version SET version = version + 1 WHERE name = '{table}';
+    END
+    """
+    for table in TRACKED
+    for event in ("INSERT", "UPDATE", "DELETE")
+]
+
+
+def ddl(dialect: str) -> list:
+    return {"postgresql": POSTGRES_DDL, "sqlite": SQLITE_DDL}.get(dialect, [])
+
+
+def install(engine):
+    """Create the counters and their triggers if missing (idempotent)"""
+    statements = ddl(engine.dialect.name)
+    if not statements:
+        logger.warning("No catalog version counters on %s; workers don't see each other's writes",
+                       engine.dialect.name)
+        return
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+def versions(bind) -> Optional[Dict[str, int]]:
+    """Every counter now, or None if the database has none"""
+    try:
+        with bind.connect() as conn:
+            return dict(conn.execute(text("SELECT name, version FROM catalog_version")).all())
+    except DBAPIError:
+        return None
+
+
+def current(bind, name: str = "cars") -> Optional[int]:
+    """One counter now, or None if the database has none"""
+    return (versions(bind) or {}).get(name)
+
+
+class Watcher:
+    """
+    Polls the counters on one daemon thread and calls the subscribers of
+    every counter that moved, in the order they subscribed (so the
+    snapshot reloads before the catalog cache lets go of its pages). A
+    subscriber that raises or returns False is called again on the next
+    poll.
+    """
+
+    def __init__(self):
+        self._subscribers = []  # [name, callback(version), last version handled]
+        self._thread = None
+
+    def subscribe(self, name: str, callback: Callable[[int], None]):
+        self._subscribers.append([name, callback, None])
+
+    def prime(self, bind):
+        """Take the current counters as handled (call before the initial loads)"""
+        seen = versions(bind) or {}
+        for subscriber in self._subscribers:
+            subscriber[2] = seen.get(subscriber[0])
+
+    def poll(self, bind):
+        seen = versions(bind)
+        if seen is None:
+            return
+        for subscriber in self._subscribers:
+            name, callback, handled = subscriber
+            version = seen.get(name)
+            if version is None or version == handled:
+                continue
+            try:
+                if callback(version) is not False:
+                    subscriber[2] = version
+            except Exception as e:
+                logger.error("Reloading after a %s change failed: %s", name, e)
+
+    def start(self, bind, interval: float = CATALOG_VERSION_POLL_SECONDS):
+        """poll() every `interval` seconds on a daemon thread"""
+        if interval <= 0 or self._thread is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.poll(bind)
+                except Exception as e:
+                    logger.error("Polling the catalog versions failed: %s", e)
+
+        self._thread = threading.Thread(target=run, name="catalog-version-watch", daemon=True)
+        self._thread.start()
+
+
+watcher = Watcher()
@@ -0,0 +1,240 @@
+# backend/covisit.py
+# "People also liked": sparse car x car co-occurrence counts over the users'
+# favorites, kept up to date by the favorite endpoints.
+import heapq
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+from log import get_logger
+
+logger = get_logger("covisit")
+
+COVISIT_DEFAULT_LIMIT = 6
+COVISIT_MAX_LIMIT = 24
+# Ranked co-favorites kept per car
+COVISIT_TOP = int(os.getenv("COVISIT_TOP", "50"))
+# Users with more favorites than this are left out of the co-counts
+# (a basket of b cars adds b*b pairs); their own recommendations still work
+COVISIT_MAX_BASKET = int(os.getenv("COVISIT_MAX_BASKET", "200"))
+# Least seconds between two rebuilds for other workers' favorites (see refresh())
+COVISIT_REBUILD_SECONDS = float(os.getenv("COVISIT_REBUILD_SECONDS", "30"))
+
+
+class CoFavoriteIndex:
+    """
+    For every car, how many users saved it together with each other car,
+    as a dict of Counters: memory grows with the pairs that actually occur,
+    never with cars x cars.
+
+    Adding or removing one favorite touches the pairs of that user's basket
+    only. The ranked top COVISIT_TOP of a car is memoized and dropped when
+    one of its counts changes or the popularity of a car it is saved with
+    does, so serving reads at most a few short lists.
+
+    Per process: this worker's writes are counted as they happen, other
+    workers' through refresh() when catalogversion.watcher sees the
+    favorites counter move.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+        self.loaded_at = float("-inf")  # time.monotonic() of the last load()
+
+    def _reset(self):
+        self.baskets = {}  # user id -> {car id: None}, oldest first
+        self.pairs = {}  # car id -> Counter(other car id -> users who saved both)
+        self.popularity = Counter()  # car id -> users who saved it (counted baskets only)
+        self._top = {}  # car id -> [(score, car id)], best first
+        self.loaded = False
+
+    # ----- counting -----
+
+    def _counted(self, basket: dict) -> bool:
+        return len(basket) <= COVISIT_MAX_BASKET
+
+    def _count_pairs(self, car_id: int, others, delta: int):
+        pairs = self.pairs
+        row = pairs.setdefault(car_id, Counter())
+        for other in others:
+            if other == car_id:
+                continue
+            row[other] += delta
+            column = pairs.setdefault(other, Counter())
+            column[car_id] += delta
+            if delta < 0:
+                if row[other] <= 0:
+                    del row[other]
+                    del column[car_id]
+                if not column:
+                    del pairs[other]
+            self._top.pop(other, None)
+        if not row:
+            del pairs[car_id]
+        self._top.pop(car_id, None)
+
+    def _saves_changed(self, car_id: int):
+        """
+        A car's popularity moved, and with it its cosine to every car it was
+        saved with: drop its ranking and every ranking it can appear in
+        """
+        self._top.pop(car_id, None)
+        for other in self.pairs.get(car_id, ()):
+            self._top.pop(other, None)
+
+    def _count_basket(self, basket: dict, delta: int):
+        """Add (delta=1) or take away (delta=-1) every pair of a whole basket"""
+        cars = list(basket)
+        for i, car_id in enumerate(cars):
+            self._count_pairs(car_id, cars[i + 1:], delta)
+            self.popularity[car_id] += delta
+            if self.popularity[car_id] <= 0:
+                del self.popularity[car_id]
+            self._saves_changed(car_id)
+
+    def add(self, user_id: int, car_id: int):
+        """A user saved a car"""
+        with self._lock:
+            basket = self.baskets.setdefault(user_id, {})
+            if car_id in basket:
+                return
+            if self._counted(basket):
+                if len(basket) + 1 > COVISIT_MAX_BASKET:
+                    self._count_basket(basket, -1)  # basket grows past the cap
+                else:
+                    self._count_pairs(car_id, basket, 1)
+                    self.popularity[car_id] += 1
+                    self._saves_changed(car_id)
+            basket[car_id] = None
+
+    def remove(self, user_id: int, car_id: int):
+        """A user un-saved a car"""
+        with self._lock:
+            basket = self.baskets.get(user_id)
+            if basket is None or car_id not in basket:
+                return
+            was_counted = self._counted(basket)
+            del basket[car_id]
+            if was_counted:
+                self._count_pairs(car_id, basket, -1)
+                self.popularity[car_id] -= 1
+                if self.popularity[car_id] <= 0:
+                    del self.popularity[car_id]
+                self._saves_changed(car_id)
+            elif self._counted(basket):
+                self._count_basket(basket, 1)  # back under the cap
+            if not basket:
+                del self.baskets[user_id]
+
+    def remove_car(self, car_id: int, user_ids):
+        """A car was deleted (its favorites go with it)"""
+        for user_id in user_ids:
+            self.remove(user_id, car_id)
+
+    def remove_user(self, user_id: int):
+        """A user was deleted (their favorites go with them)"""
+        with self._lock:
+            cars = list(self.baskets.get(user_id, ()))
+        for car_id in reversed(cars):
+            self.remove(user_id, car_id)
+
+    # ----- ranking -----
+
+    def _ranked(self, car_id: int) -> list:
+        """Top COVISIT_TOP (score, car) for a car (lock held)"""
+        top = self._top.get(car_id)
+        if top is None:
+            row = self.pairs.get(car_id)
+            popularity = self.popularity
+            # Cosine of the two cars' user sets: co-saves / sqrt(saves(a) * saves(b)),
+            # so a car everybody saves doesn't top every list
+            top = heapq.nlargest(
+                COVISIT_TOP,
+                ((count / math.sqrt(popularity[car_id] * popularity[other]), other)
+                 for other, count in row.items()),
+                key=lambda entry: (entry[0], -entry[1]),
+            ) if row else []
+            self._top[car_id] = top
+        return top
+
+    def also_liked(self, car_id: int, limit: int = COVISIT_DEFAULT_LIMIT, exclude=()) -> List[int]:
+        """Cars most often saved together with car_id"""
+        with self._lock:
+            return [other for _, other in self._ranked(car_id) if other not in exclude][:limit]
+
+    def recommend(self, user_id: int, limit: int = COVISIT_DEFAULT_LIMIT) -> List[int]:
+        """
+        Cars to suggest to a user: the co-favorite lists of their most recent
+        COVISIT_MAX_BASKET saves, summed, without the cars they already saved
+        """
+        with self._lock:
+            basket = self.baskets.get(user_id)
+            if not basket:
+                return []
+            scores = Counter()
+            for car_id in list(basket)[-COVISIT_MAX_BASKET:]:
+                for score, other in self._ranked(car_id):
+                    if other not in basket:
+                        scores[other] += score
+            best = heapq.nlargest(limit, scores.items(), key=lambda entry: (entry[1], -entry[0]))
+            return [car_id for car_id, _ in best]
+
+    # ----- batch -----
+
+    def load(self, bind):
+        """(Re)build from the favorites table, one user at a time"""
+        started = time.perf_counter()
+        Favorite = models.Favorite
+        baskets = {}
+        with Session(bind) as db:
+            result = db.execute(
+                select(Favorite.user_id, Favorite.car_id)
+                .order_by(Favorite.user_id, Favorite.created_at, Favorite.id)
+                .execution_options(yield_per=50000)
+            )
+            for rows in result.partitions():
+                for user_id, car_id in rows:
+                    baskets.setdefault(user_id, {})[car_id] = None
+
+        pairs = {}
+        popularity = Counter()
+        for basket in baskets.values():
+            if not self._counted(basket):
+                continue
+            popularity.update(basket.keys())
+            for car_id in basket:
+                row = pairs.setdefault(car_id, Counter())
+                row.update(basket.keys())
+                del row[car_id]
+        pairs = {car_id: row for car_id, row in pairs.items() if row}
+
+        with self._lock:
+            self.baskets = baskets
+            self.pairs = pairs
+            self.popularity = popularity
+            self._top = {}
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+        logger.info("🤝 Co-favorites loaded: %d users, %d cars in %.2fs",
+                    len(baskets), len(pairs), time.perf_counter() - started)
+
+    def refresh(self, bind) -> bool:
+        """
+        load(), unless the last one is less than COVISIT_REBUILD_SECONDS old:
+        then False, and the watcher asks again on a later poll
+        """
+        if time.monotonic() - self.loaded_at < COVISIT_REBUILD_SECONDS:
+            return False
+        self.load(bind)
+        return True
+
+
+index = CoFavoriteIndex()
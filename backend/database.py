@@ -1,9 +1,26 @@
 # backend/database.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
+import contextvars
+import hashlib
+import hmac
+import itertools
 import os
+import threading
+import time
+import uuid
+from typing import Optional
 from dotenv import load_dotenv
+from log import get_logger
+import metrics
+
+logger = get_logger("database")
 
 # Load environment variables from .env file
 load_dotenv()
@@ -11,28 +28,314 @@ load_dotenv()
 # Get database URL from environment variable
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-print(f"🔍 DATABASE_URL from .env: {DATABASE_URL}")  # Debug print
-
 if not DATABASE_URL:
-    print("❌ ERROR: DATABASE_URL not found in .env file!")
-    print(f"📂 Current directory: {os.getcwd()}")
-    print(f"📄 .env file exists: {os.path.exists('.env')}")
+    logger.error("❌ DATABASE_URL not found in .env file!")
+    logger.error("📂 Current directory: %s", os.getcwd())
+    logger.error("📄 .env file exists: %s", os.path.exists('.env'))
     raise ValueError("DATABASE_URL environment variable is not set")
 
+logger.info("🔍 DATABASE_URL: %s", make_url(DATABASE_URL).render_as_string(hide_password=True))
+
+# ============= CONNECTION POOL =============
+
+# Connections kept open, and extra ones opened under load (closed when returned)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Test each connection with a round trip when it is checked out
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# Replace connections older than this many seconds (-1 = never). With
+# DB_POOL_PRE_PING=0 this is the cheaper way to drop connections the server
+# or a firewall closes when idle: set it below that idle limit.
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+# Behind PgBouncer in transaction pooling mode: no server-side prepared
+# statement cache (a statement prepared on one server connection isn't
+# there on the next transaction's)
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "0") == "1"
+
+# Seconds spent waiting for a connection
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class PoolTelemetry:
+    """Checkout waits, timeouts and overflow connections of one pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.wait = metrics.Histogram(POOL_WAIT_BUCKETS)
+        self.max_wait = 0.0
+        self.timeouts = 0
+        self.overflow_opened = 0
+
+    def observe(self, elapsed: float):
+        with self.lock:
+            self.wait.observe(elapsed)
+            self.max_wait = max(self.max_wait, elapsed)
+
+
+class InstrumentedPool:
+    """
+    Mixin for QueuePool and AsyncAdaptedQueuePool recording how long each
+    checkout took (waiting for a free connection, opening a new one and the
+    pre-ping included), timeouts, and connections opened beyond pool_size
+    """
+    telemetry: PoolTelemetry = None
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            with self.telemetry.lock:
+                self.telemetry.timeouts += 1
+            raise
+        finally:
+            self.telemetry.observe(time.perf_counter() - started)
+
+    def _inc_overflow(self):
+        opened = super()._inc_overflow()
+        if opened and self._overflow > 0:
+            with self.telemetry.lock:
+                self.telemetry.overflow_opened += 1
+        return opened
+
+    def stats(self) -> dict:
+        telemetry = self.telemetry
+        with telemetry.lock:
+            return {
+                "size": self.size(),
+                "max_overflow": self._max_overflow,
+                "checked_out": self.checkedout(),
+                "idle": self.checkedin(),
+                "overflow": max(self.overflow(), 0),
+                "checkouts": telemetry.wait.count,
+                "wait_seconds_total": round(telemetry.wait.sum, 6),
+                "wait_seconds_max": round(telemetry.max_wait, 6),
+                "wait_buckets": dict(zip(map(str, telemetry.wait.bounds), telemetry.wait.counts)),
+                "timeouts": telemetry.timeouts,
+                "overflow_opened": telemetry.overflow_opened,
+            }
+
+
+def pool_class(name: str, base):
+    return type(f"Instrumented{base.__name__}", (InstrumentedPool, base), {"telemetry": PoolTelemetry(name)})
+
+
+def make_engine(url, name: str):
+    """Sync engine with the DB_POOL_* settings and an instrumented pool"""
+    connect_args = {}
+    if make_url(url).get_backend_name() == "postgresql":
+        # psycopg2's option; sqlite3 rejects unknown keywords
+        connect_args["connect_timeout"] = DB_CONNECT_TIMEOUT
+    return create_engine(
+        url,
+        poolclass=pool_class(name, QueuePool),
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        connect_args=connect_args,
+    )
+
+
 # Create database engine with connection pooling and timeout settings
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,  # Verify connections before using them
-    pool_size=5,
-    max_overflow=10,
-    connect_args={
-        "connect_timeout": 10,  # 10 second timeout
-    }
-)
+engine = make_engine(DATABASE_URL, "sync")
 
 # Create a session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the read-heavy endpoints. DB_ASYNC=0 (or a missing async
+# driver) falls back to running the sync engine in the threadpool.
+DB_ASYNC = os.getenv("DB_ASYNC", "1") == "1"
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_url(url: str):
+    """Same database, async driver (None if we don't know one)"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return None
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+def make_async_engine(url, name: str):
+    """Async engine for the same database, None if DB_ASYNC=0 or there is no async driver"""
+    async_url = get_async_url(url)
+    if not DB_ASYNC or async_url is None:
+        return None
+    try:
+        if async_url.get_backend_name() != "postgresql":
+            return create_async_engine(async_url)
+        connect_args = {"timeout": DB_CONNECT_TIMEOUT}
+        if DB_PGBOUNCER:
+            # asyncpg prepares every statement: keep neither its cache nor
+            # SQLAlchemy's, and name them uniquely so two clients sharing
+            # a server connection never collide
+            async_url = async_url.update_query_dict({"prepared_statement_cache_size": "0"})
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+        return create_async_engine(
+            async_url,
+            poolclass=pool_class(name, AsyncAdaptedQueuePool),
+            pool_pre_ping=DB_POOL_PRE_PING,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            connect_args=connect_args,
+        )
+    except ImportError as e:
+        logger.warning("⚠️ Async driver not available (%s), using the sync database path", e)
+        return None
+
+async_engine = make_async_engine(DATABASE_URL, "async")
+AsyncSessionLocal = None
+if async_engine is not None:
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
+# ============= READ REPLICAS =============
+
+# Comma-separated URLs of read replicas of DATABASE_URL. Catalog reads
+# (get_read_db / get_read_async_db) go to them in turn; writes, auth and
+# everything else stay on the primary.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# After a write, the client that made it (cookie) reads from the primary for
+# this many seconds: longer than the replicas usually lag
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+REPLICA_PIN_COOKIE = "db_primary_until"
+# Signs the cookie so a client can't pin itself to the primary (same key as auth.SECRET_KEY)
+REPLICA_PIN_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production").encode()
+
+replica_engines = [make_engine(url, f"replica{i}") for i, url in enumerate(DATABASE_REPLICA_URLS)]
+ReplicaSessionLocals = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica) for replica in replica_engines
+]
+replica_async_engines = [
+    make_async_engine(url, f"replica{i}-async") for i, url in enumerate(DATABASE_REPLICA_URLS)
+]
+ReplicaAsyncSessionLocals = [
+    async_sessionmaker(replica, autoflush=False, expire_on_commit=False) if replica is not None else None
+    for replica in replica_async_engines
+]
+
+_next_replica = itertools.count()
+# True while handling a request that must see the primary (see ReadYourWritesMiddleware)
+read_from_primary = contextvars.ContextVar("read_from_primary", default=False)
+
+
+def replica_index() -> Optional[int]:
+    """The replica the next read goes to, or None for the primary"""
+    if not replica_engines or read_from_primary.get():
+        return None
+    return next(_next_replica) % len(replica_engines)
+
+
+def instrumented_pools() -> dict:
+    pools = {"sync": engine.pool}
+    if async_engine is not None:
+        pools["async"] = async_engine.sync_engine.pool
+    for i, replica in enumerate(replica_engines):
+        pools[f"replica{i}"] = replica.pool
+    for i, replica in enumerate(replica_async_engines):
+        if replica is not None:
+            pools[f"replica{i}-async"] = replica.sync_engine.pool
+    return {name: pool for name, pool in pools.items() if isinstance(pool, InstrumentedPool)}
+
+
+def pool_stats() -> dict:
+    """Occupancy and checkout telemetry of the pools, plus the settings"""
+    return {
+        "settings": {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pre_ping": DB_POOL_PRE_PING,
+            "recycle": DB_POOL_RECYCLE,
+            "pgbouncer": DB_PGBOUNCER,
+            "replicas": len(replica_engines),
+            "replica_sticky_seconds": REPLICA_STICKY_SECONDS,
+        },
+        "pools": {name: pool.stats() for name, pool in instrumented_pools().items()},
+    }
+
+
+def collect_pool_metrics() -> list:
+    """Metrics lines for /metrics"""
+    pools = instrumented_pools()
+    stats = {name: pool.stats() for name, pool in pools.items()}
+    lines = []
+    for metric, help_text, kind, field in (
+        ("db_pool_checked_out", "Connections in use.", "gauge", "checked_out"),
+        ("db_pool_idle", "Open connections waiting in the pool.", "gauge", "idle"),
+        ("db_pool_overflow", "Connections open beyond pool_size.", "gauge", "overflow"),
+        ("db_pool_checkout_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT.", "counter", "timeouts"),
+        ("db_pool_overflow_opened_total", "Connections opened beyond pool_size.", "counter", "overflow_opened"),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        lines += [f'{metric}{{pool="{name}"}} {values[field]}' for name, values in stats.items()]
+    lines += [
+        "# HELP db_pool_checkout_seconds Time to get a connection from the pool.",
+        "# TYPE db_pool_checkout_seconds histogram",
+    ]
+    for name, pool in pools.items():
+        with pool.telemetry.lock:
+            lines += pool.telemetry.wait.exposition("db_pool_checkout_seconds", f'pool="{name}"')
+    return lines
+
+
+metrics.register_collector(collect_pool_metrics)
+
+# ============= QUERY INSTRUMENTATION =============
+
+# Statements slower than this are logged with their parameters
+SQL_SLOW_MS = float(os.getenv("SQL_SLOW_MS", "200"))
+
+def install_query_hooks(target):
+    """
+    Count statements and DB time per request (metrics.current_request) and log
+    slow statements. `target` is a sync Engine (AsyncEngine.sync_engine for async).
+    """
+    @event.listens_for(target, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_start"] = time.perf_counter()
+
+    @event.listens_for(target, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop("query_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        stats = metrics.current_request.get()
+        if stats is not None:
+            stats.db_time += elapsed
+            stats.db_statements += 1
+            # Bound parameters are placeholders, so the text is the statement's shape.
+            # executemany batches (bulk import) are one statement per chunk, not N+1.
+            if not executemany:
+                stats.statement_counts[statement] += 1
+        if elapsed * 1000 >= SQL_SLOW_MS:
+            metrics.record_slow_query()
+            logger.warning(
+                "🐢 Slow query (%.1f ms): %s | params: %.500r", elapsed * 1000, statement, parameters
+            )
+
+install_query_hooks(engine)
+if async_engine is not None:
+    install_query_hooks(async_engine.sync_engine)
+for replica in replica_engines:
+    install_query_hooks(replica)
+for replica in replica_async_engines:
+    if replica is not None:
+        install_query_hooks(replica.sync_engine)
+
 # Base class for our database models
 Base = declarative_base()
 
@@ -48,15 +351,158 @@ def get_db():
     finally:
         db.close()
 
+class SyncSessionAdapter:
+    """
+    Sync fallback for get_async_db: exposes the AsyncSession methods the
+    async endpoints use, running a regular Session in the threadpool.
+    Results are buffered like AsyncSession results are.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    async def execute(self, statement, *args, **kwargs):
+        def run():
+            return self.sync_session.execute(statement, *args, **kwargs).freeze()
+        frozen = await run_in_threadpool(run)
+        return frozen()
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def refresh(self, instance):
+        await run_in_threadpool(self.sync_session.refresh, instance)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+# Dependency to get an async database session
+async def get_async_db():
+    """
+    Like get_db, for `async def` endpoints: an AsyncSession, or the sync
+    session wrapped in SyncSessionAdapter when the async path is off
+    """
+    if AsyncSessionLocal is None:
+        db = SyncSessionAdapter(SessionLocal())
+        try:
+            yield db
+        finally:
+            await db.close()
+        return
+
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Dependencies for read-only endpoints: a replica session when one is configured
+# and the request isn't pinned to the primary (see replica_index)
+def get_read_db():
+    """Like get_db, on a read replica"""
+    i = replica_index()
+    db = SessionLocal() if i is None else ReplicaSessionLocals[i]()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_read_async_db():
+    """Like get_async_db, on a read replica"""
+    i = replica_index()
+    if i is None:
+        sync_factory, async_factory = SessionLocal, AsyncSessionLocal
+    else:
+        sync_factory, async_factory = ReplicaSessionLocals[i], ReplicaAsyncSessionLocals[i]
+    if async_factory is None:
+        db = SyncSessionAdapter(sync_factory())
+        try:
+            yield db
+        finally:
+            await db.close()
+        return
+
+    async with async_factory() as db:
+        yield db
+
+def _pin_signature(until: str) -> str:
+    return hmac.new(REPLICA_PIN_KEY, until.encode(), hashlib.sha256).hexdigest()[:32]
+
+def _pinned_until(scope, now: float) -> float:
+    """Until when the cookie pins this client, never beyond now + REPLICA_STICKY_SECONDS"""
+    for name, value in scope.get("headers", ()):
+        if name == b"cookie":
+            for part in value.decode("latin-1").split(";"):
+                key, _, pinned = part.strip().partition("=")
+                if key == REPLICA_PIN_COOKIE:
+                    until, _, signature = pinned.rpartition(".")
+                    if not hmac.compare_digest(signature, _pin_signature(until)):
+                        return 0.0
+                    try:
+                        return min(float(until), now + REPLICA_STICKY_SECONDS)
+                    except ValueError:
+                        return 0.0
+    return 0.0
+
+class ReadYourWritesMiddleware:
+    """
+    Keeps a client on the primary right after it writes. A successful
+    non-GET request sets a cookie valid for REPLICA_STICKY_SECONDS; requests
+    carrying it, and the writes themselves, read from the primary. Does
+    nothing without replicas.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not replica_engines or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        now = time.time()
+        write = scope["method"] not in ("GET", "HEAD", "OPTIONS")
+        token = read_from_primary.set(write or _pinned_until(scope, now) > now)
+        try:
+            if not write:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start" and message["status"] < 400:
+                    until = f"{now + REPLICA_STICKY_SECONDS:.3f}"
+                    cookie = (
+                        f"{REPLICA_PIN_COOKIE}={until}.{_pin_signature(until)}; "
+                        f"Max-Age={max(1, round(REPLICA_STICKY_SECONDS))}; Path=/; HttpOnly; SameSite=Lax"
+                    )
+                    message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            read_from_primary.reset(token)
+
 # Test connection on startup
-def test_connection():
-    """Test database connection"""
+def test_connection(bind=None):
+    """Test database connection (the primary unless `bind` is given)"""
+    bind = engine if bind is None else bind
     try:
-        print("🔄 Testing database connection...")
-        connection = engine.connect()
+        logger.info("🔄 Testing database connection...")
+        connection = bind.connect()
         connection.close()
-        print("✅ Database connection successful!")
+        logger.info("✅ Database connection successful!")
         return True
     except Exception as e:
-        print(f"❌ Database connection failed: {e}")
-        return False
\ No newline at end of file
+        logger.error("❌ Database connection failed: %s", e)
+        return False
@@ -0,0 +1,121 @@
+# backend/exporter.py
+# Streaming CSV / NDJSON export. Rows come off a server-side cursor
+# (yield_per) and are written out in chunks, so memory stays flat and the
+# header is sent before the query even runs.
+import csv
+import io
+import json
+import os
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+import models
+from database import SessionLocal
+from log import get_logger
+
+logger = get_logger("exporter")
+
+# Rows fetched per round trip and written per response chunk
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Exported columns per dataset; the car columns are also the import format
+DATASETS = {
+    "cars": (models.Car, [
+        "id", "name", "price", "year", "mileage", "image", "featured", "description",
+        "engine", "transmission", "fuel", "color", "created_at",
+    ]),
+    "test_drives": (models.TestDrive, [
+        "id", "user_id", "car_id", "preferred_date", "preferred_time", "slot_start",
+        "location", "phone", "message", "status", "created_at",
+    ]),
+    "contact_inquiries": (models.ContactInquiry, [
+        "id", "user_id", "name", "email", "phone", "subject", "message", "created_at",
+    ]),
+}
+
+
+def _value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _csv_line(values) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def statement(dataset: str, conditions: Optional[List] = None):
+    """Column select of a dataset in id order, with optional WHERE conditions"""
+    model, columns = DATASETS[dataset]
+    stmt = select(*[getattr(model, column) for column in columns]).order_by(model.id)
+    if conditions:
+        stmt = stmt.where(*conditions)
+    return stmt
+
+
+def stream(dataset: str, fmt: str, conditions: Optional[List] = None) -> Iterator[bytes]:
+    """
+    Encoded chunks of the export. Uses its own session: the request's session
+    is closed long before a large export finishes streaming.
+    """
+    _, columns = DATASETS[dataset]
+    if fmt == "csv":
+        yield _csv_line(columns).encode()
+
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            statement(dataset, conditions).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        for rows in result.partitions():
+            buffer = io.StringIO()
+            if fmt == "csv":
+                writer = csv.writer(buffer)
+                for row in rows:
+                    writer.writerow([_value(value) for value in row])
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(columns, map(_value, row)))))
+                    buffer.write("\n")
+            yield buffer.getvalue().encode()
+    except Exception as e:
+        # Headers are already sent; all we can do is cut the stream short
+        logger.error("Export of %s failed: %s", dataset, e)
+        raise
+    finally:
+        db.close()
+
+
+def created_conditions(model, created_from: Optional[date], created_to: Optional[date]) -> list:
+    """created_at within [created_from, created_to] (whole days, both optional)"""
+    conditions = []
+    if created_from:
+        conditions.append(model.created_at >= created_from)
+    if created_to:
+        conditions.append(model.created_at < created_to + timedelta(days=1))
+    return conditions
+
+
+def response(dataset: str, fmt: str, conditions: Optional[List] = None) -> StreamingResponse:
+    """StreamingResponse downloading the export as <dataset>.<fmt>"""
+    if fmt not in FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format. Must be one of: {', '.join(FORMATS)}"
+        )
+    return StreamingResponse(
+        stream(dataset, fmt, conditions),
+        media_type=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{fmt}"'},
+    )
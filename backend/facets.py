@@ -0,0 +1,105 @@
+# backend/facets.py
+from sqlalchemy import String, case, cast, func, literal, select, union_all
+
+import models
+import search
+
+# Histogram bin widths
+PRICE_BIN = 10000
+YEAR_BIN = 1
+MILEAGE_BIN = 10000
+
+CATEGORY_FACETS = ["brand", "color", "transmission", "fuel"]
+HISTOGRAMS = {"price": PRICE_BIN, "year": YEAR_BIN, "mileage": MILEAGE_BIN}
+
+
+def brand_expression(name_column):
+    """SQL equivalent of search.extract_brand()"""
+    return case(
+        *[(name_column.contains(brand), brand) for brand in search.BRANDS],
+        else_=search.OTHER_BRAND
+    )
+
+
+def engine_size_expression(engine_column, size: str):
+    engine = func.lower(engine_column)
+    return case(
+        *[(engine.contains(fragment), 1) for fragment in search.ENGINE_SIZES[size]],
+        else_=0
+    )
+
+
+def facets_statement(filters: search.CarFilters):
+    """
+    One statement computing every facet and histogram for a filter set.
+    The filtered rows are a CTE read by each UNION ALL branch, so on
+    PostgreSQL the cars table is scanned once and the branches aggregate
+    the materialized rows.
+    """
+    Car = models.Car
+    filtered = (
+        select(
+            Car.name, Car.color, Car.transmission, Car.fuel, Car.engine,
+            Car.price, Car.year, Car.mileage
+        )
+        .where(*search.filter_conditions(filters))
+        .cte("filtered")
+    )
+    f = filtered.c
+
+    def grouped(facet, expression):
+        value = cast(expression, String)
+        return (
+            select(literal(facet).label("facet"), value.label("value"), func.count().label("count"))
+            .select_from(filtered)
+            .group_by(value)
+        )
+
+    parts = [
+        select(literal("total").label("facet"), literal("").label("value"), func.count().label("count"))
+        .select_from(filtered),
+        grouped("brand", brand_expression(f.name)),
+        grouped("color", f.color),
+        grouped("transmission", f.transmission),
+        grouped("fuel", f.fuel),
+    ]
+    for size in search.ENGINE_SIZES:
+        parts.append(
+            select(
+                literal("engine_size").label("facet"),
+                literal(size).label("value"),
+                func.coalesce(func.sum(engine_size_expression(f.engine, size)), 0).label("count")
+            ).select_from(filtered)
+        )
+    for column_name, width in HISTOGRAMS.items():
+        parts.append(grouped(column_name, (getattr(f, column_name) // width) * width))
+
+    return union_all(*parts)
+
+
+def build_facets(rows) -> dict:
+    """Shape the rows of facets_statement() for the inventory sidebar"""
+    result = {
+        "total": 0,
+        "facets": {name: {} for name in CATEGORY_FACETS + ["engine_size"]},
+        "histograms": {
+            name: {"bin_width": width, "bins": []} for name, width in HISTOGRAMS.items()
+        },
+    }
+
+    for facet, value, count in rows:
+        if facet == "total":
+            result["total"] = count
+        elif facet in HISTOGRAMS:
+            if value is not None:
+                result["histograms"][facet]["bins"].append({"start": int(value), "count": count})
+        elif value is not None:
+            result["facets"][facet][value] = count
+
+    for name in CATEGORY_FACETS:
+        result["facets"][name] = dict(sorted(result["facets"][name].items()))
+    for histogram in result["histograms"].values():
+        histogram["bins"].sort(key=lambda b: b["start"])
+
+    return result
+
@@ -0,0 +1,139 @@
+# backend/fulltext.py
+# Ranked full-text search over name, description, engine, transmission and fuel.
+# PostgreSQL: a generated, GIN-indexed tsvector column on cars.
+# SQLite (local/dev): an external-content FTS5 table kept in sync by triggers.
+# Both stay current for every write path (ORM, bulk import, COPY, raw SQL).
+import re
+from typing import Optional
+
+from sqlalchemy import column, func, literal_column, table, text
+
+import models
+import readmodels
+import search
+from log import get_logger
+
+logger = get_logger("fulltext")
+
+# Name matches count most, then the specs, then the description
+POSTGRES_DDL = [
+    """
+    ALTER TABLE cars ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(engine, '') || ' ' ||
+                                         coalesce(transmission, '') || ' ' ||
+                                         coalesce(fuel, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_cars_search ON cars USING GIN (search_vector)",
+]
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS cars_fts USING fts5(
+        name, description, engine, transmission, fuel,
+        content='cars', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cars_fts_insert AFTER INSERT ON cars BEGIN
+        INSERT INTO cars_fts(rowid, name, description, engine, transmission, fuel)
+        VALUES (new.id, new.name, new.description, new.engine, new.transmission, new.fuel);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cars_fts_delete AFTER DELETE ON cars BEGIN
+        INSERT INTO cars_fts(cars_fts, rowid, name, description, engine, transmission, fuel)
+        VALUES ('delete', old.id, old.name, old.description, old.engine, old.transmission, old.fuel);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cars_fts_update AFTER UPDATE ON cars BEGIN
+        INSERT INTO cars_fts(cars_fts, rowid, name, description, engine, transmission, fuel)
+        VALUES ('delete', old.id, old.name, old.description, old.engine, old.transmission, old.fuel);
+        INSERT INTO cars_fts(rowid, name, description, engine, transmission, fuel)
+        VALUES (new.id, new.name, new.description, new.engine, new.transmission, new.fuel);
+    END
+    """,
+]
+
+# bm25 column weights, same order as the cars_fts columns
+SQLITE_WEIGHTS = (10.0, 1.0, 4.0, 4.0, 4.0)
+cars_fts = table("cars_fts", column("rowid"))
+
+# "postgresql", "sqlite" or None (search unavailable), set by install()
+backend = None
+
+
+def use(engine):
+    """Turn search on for a database install() already prepared (no DDL)"""
+    global backend
+    if engine.dialect.name in ("postgresql", "sqlite"):
+        backend = engine.dialect.name
+
+
+def install(engine):
+    """Create the search column/index or FTS table if missing (idempotent)"""
+    global backend
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        with engine.begin() as conn:
+            for ddl in POSTGRES_DDL:
+                conn.execute(text(ddl))
+    elif dialect == "sqlite":
+        with engine.begin() as conn:
+            existed = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cars_fts'")
+            ).first()
+            for ddl in SQLITE_DDL:
+                conn.execute(text(ddl))
+            if not existed:
+                # Index the cars that were there before the table
+                conn.execute(text("INSERT INTO cars_fts(cars_fts) VALUES ('rebuild')"))
+    else:
+        logger.warning("Full-text search is not available on %s", dialect)
+        return
+    backend = dialect
+    logger.info("🔎 Full-text search ready (%s)", dialect)
+
+
+def _fts5_query(q: str) -> Optional[str]:
+    """Plain words -> FTS5 query matching all of them (no FTS5 syntax from users)"""
+    words = re.findall(r"\w+", q.lower())
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words)
+
+
+def search_statement(q: str, filters: search.CarFilters, limit: int, offset: int = 0):
+    """
+    readmodels.car_select() of the cars matching `q` and the inventory
+    filters, best match first (ties: newest).
+    None when the query has no searchable words.
+    """
+    Car = models.Car
+    if backend == "postgresql":
+        query = func.websearch_to_tsquery("english", q)
+        vector = literal_column("cars.search_vector")
+        rank = func.ts_rank_cd(vector, query)
+        stmt = readmodels.car_select().where(vector.op("@@")(query)).order_by(rank.desc(), Car.id.desc())
+    elif backend == "sqlite":
+        match = _fts5_query(q)
+        if match is None:
+            return None
+        fts = literal_column("cars_fts")
+        # bm25() is lower for better matches
+        rank = func.bm25(fts, *SQLITE_WEIGHTS)
+        stmt = (
+            readmodels.car_select()
+            .join(cars_fts, cars_fts.c.rowid == Car.id)
+            .where(fts.op("MATCH")(match))
+            .order_by(rank, Car.id.desc())
+        )
+    else:
+        return None
+
+    stmt = search.apply_filters(stmt, filters)
+    return stmt.limit(limit).offset(offset)
@@ -0,0 +1,191 @@
+# backend/importer.py
+# Bulk car import from CSV or NDJSON. The file is read one row at a time and
+# inserted in fixed-size chunks (one transaction each), so memory stays flat
+# whatever the file size.
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+from typing import BinaryIO, Iterator, Tuple
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+import models
+from log import get_logger
+
+logger = get_logger("importer")
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+# Rows listed in the error report; the rest are only counted
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+
+FORMATS = ("csv", "ndjson")
+
+# CSV header / flat NDJSON keys; engine, transmission and fuel form CarCreate.specs
+COLUMNS = [
+    "name", "price", "year", "mileage", "image", "featured", "description",
+    "engine", "transmission", "fuel", "color",
+]
+SPEC_FIELDS = ("engine", "transmission", "fuel")
+COPY_COLUMNS = COLUMNS + ["created_at"]
+# Unquoted NULL marker of the COPY data (a quoted "\N" is the text \N)
+COPY_NULL = "\\N"
+
+
+def detect_format(filename: str, content_type: str) -> str:
+    """csv or ndjson from the upload's file name / content type"""
+    name = (filename or "").lower()
+    content_type = (content_type or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type or "jsonl" in content_type:
+        return "ndjson"
+    return "csv"
+
+
+def _records(source: BinaryIO, fmt: str) -> Iterator[Tuple[int, object]]:
+    """(line number, dict or error message) for every data row"""
+    text = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, "Each line must be a JSON object"
+            continue
+        yield line_number, record
+
+
+def _normalize(record: dict) -> dict:
+    """Accept flat (CSV style) or nested (CarCreate style) specs"""
+    record = {key: value for key, value in record.items() if key is not None}
+    if "specs" not in record:
+        record["specs"] = {field: record.pop(field, None) for field in SPEC_FIELDS}
+    if record.get("color") in ("", None):
+        # CarCreate.color is optional but not nullable
+        record.pop("color", None)
+    return record
+
+
+def _row(car: BaseModel, created_at: datetime) -> dict:
+    return {
+        "name": car.name,
+        "price": car.price,
+        "year": car.year,
+        "mileage": car.mileage,
+        "image": car.image,
+        "featured": car.featured,
+        "description": car.description,
+        "engine": car.specs.engine,
+        "transmission": car.specs.transmission,
+        "fuel": car.specs.fuel,
+        "color": car.color,
+        "created_at": created_at,
+    }
+
+
+def _can_copy(db: Session) -> bool:
+    dialect = db.get_bind().dialect
+    return dialect.name == "postgresql" and dialect.driver == "psycopg2"
+
+
+def _copy_field(value) -> str:
+    """
+    One COPY CSV field: None as the unquoted NULL marker, everything else
+    quoted, so an empty string stays an empty string (csv.writer can't
+    leave only None unquoted)
+    """
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, (bool, int, float)):
+        return str(value)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy(db: Session, rows: list):
+    """PostgreSQL COPY of one chunk (psycopg2)"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(_copy_field(row[column]) for column in COPY_COLUMNS))
+        buffer.write("\n")
+    buffer.seek(0)
+    raw = db.connection().connection.driver_connection
+    with raw.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY cars ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')", buffer
+        )
+
+
+def import_cars(db: Session, source: BinaryIO, fmt: str, schema) -> dict:
+    """
+    Validate every row against `schema` (CarCreate) and insert the valid ones,
+    IMPORT_CHUNK_SIZE rows per transaction. Returns counts and the error report.
+    """
+    use_copy = _can_copy(db)
+    started = time.perf_counter()
+    report = {"rows": 0, "inserted": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+    def add_error(line, errors):
+        report["failed"] += 1
+        if len(report["errors"]) < IMPORT_MAX_ERRORS:
+            report["errors"].append({"line": line, "errors": errors})
+        else:
+            report["errors_truncated"] = True
+
+    def flush(chunk):
+        if not chunk:
+            return
+        rows = [row for _, row in chunk]
+        try:
+            if use_copy:
+                _copy(db, rows)
+            else:
+                # Core insert: one executemany per chunk (the ORM bulk path
+                # splits the chunk wherever the set of non-None columns changes)
+                db.execute(insert(models.Car.__table__), rows)
+            db.commit()
+            report["inserted"] += len(rows)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning("Import chunk failed: %s", e)
+            message = f"Chunk not inserted: {getattr(e, 'orig', e)}"
+            for line, _ in chunk:
+                add_error(line, [message])
+
+    chunk = []
+    for line, record in _records(source, fmt):
+        report["rows"] += 1
+        if isinstance(record, str):
+            add_error(line, [record])
+            continue
+        try:
+            car = schema.model_validate(_normalize(record))
+        except ValidationError as e:
+            add_error(line, [f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()])
+            continue
+        chunk.append((line, _row(car, datetime.utcnow())))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            flush(chunk)
+            chunk = []
+    flush(chunk)
+
+    elapsed = time.perf_counter() - started
+    report["method"] = "copy" if use_copy else "insert"
+    report["seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["inserted"] / elapsed, 1) if elapsed else None
+    return report
@@ -0,0 +1,26 @@
+# backend/lazy.py
+# Deferred imports for heavy optional dependencies (NumPy): the module object
+# exists at import time, the library itself is loaded on first attribute use.
+import importlib.util
+import sys
+from typing import Optional
+
+
+def lazy_import(name: str) -> Optional[object]:
+    """
+    `name` as a module that is executed on first attribute access; None if
+    it isn't installed. Use it where `import name` would go, for libraries
+    only some code paths need.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,16 @@
+# backend/log.py
+import logging
+import os
+
+# LOG_LEVEL=DEBUG turns the debug output back on; it stays off the hot paths otherwise
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+logging.basicConfig(
+    level=LOG_LEVEL,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for one of the backend modules"""
+    return logging.getLogger(f"elite_motors.{name}")
@@ -1,40 +1,116 @@
 # backend/main.py
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, File, Query, Request, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from sqlalchemy import func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional, Union
+import logging
 import models
-from database import engine, get_db, Base, test_connection
-from pydantic import BaseModel
-import sys
+import search
+import facets
+import cache
+import rollups
+import metrics
+import profiler
+import importer
+import exporter
+import fulltext
+import suggest
+import readmodels
+import snapshot
+import similar
+import covisit
+import scheduler
+import ratelimit
+import writebehind
+import schema
+import catalogversion
+import database
+from database import engine, async_engine, get_db, get_async_db, get_read_async_db, test_connection
+from log import get_logger
+from pydantic import BaseModel, TypeAdapter
+import json
+import time
 
 from fastapi.security import OAuth2PasswordRequestForm
-from datetime import timedelta
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from datetime import date, datetime
 import auth
+import passwords
+
+logger = get_logger("main")
+
+# Reloads after any worker's writes, in this order (see catalogversion.Watcher)
+if snapshot.inventory:
+    catalogversion.watcher.subscribe("cars", lambda version: snapshot.inventory.refresh(engine))
+catalogversion.watcher.subscribe("cars", cache.catalog_cache.set_version)
+catalogversion.watcher.subscribe("cars", lambda version: suggest.index.load(engine))
+if similar.index:
+    catalogversion.watcher.subscribe("cars", lambda version: similar.index.refresh(engine))
+catalogversion.watcher.subscribe("favorites", lambda version: covisit.index.refresh(engine))
+catalogversion.watcher.subscribe("test_drives", lambda version: scheduler.index.load(engine))
+catalogversion.watcher.subscribe("token_revocations", lambda version: auth.load_revocations(engine))
+
+def start_up():
+    """Check the database, bring the schema up to date and load the in-memory indexes"""
+    started = time.perf_counter()
+    logger.info("Starting Elite Motors API...")
+    if not test_connection():
+        raise RuntimeError(
+            "Cannot start server - database connection failed. "
+            "Make sure Docker PostgreSQL is running: docker-compose up -d"
+        )
+    for i, replica in enumerate(database.replica_engines):
+        if not test_connection(replica):
+            raise RuntimeError(f"Cannot start server - read replica {i} is unreachable")
+    schema.ensure(engine)
+    catalogversion.watcher.prime(engine)
+    cache.catalog_cache.set_version(catalogversion.current(engine))
+    auth.load_revocations(engine)
+    scheduler.index.load(engine)
+    suggest.index.load(engine)
+    if snapshot.inventory:
+        snapshot.inventory.load(engine)
+    if similar.index:
+        similar.index.refresh(engine)  # in the background; /similar answers 503 until done
+    covisit.index.load(engine)
+    catalogversion.watcher.start(engine)
+    logger.info("🚀 Startup complete in %.2fs", time.perf_counter() - started)
+
+
+async def shut_down():
+    """Finish queued and background writes, then close the pools"""
+    await run_in_threadpool(writebehind.shutdown)
+    await run_in_threadpool(passwords.shutdown)
+    for bind in (async_engine, *database.replica_async_engines):
+        if bind is not None:
+            await bind.dispose()
+    for bind in (engine, *database.replica_engines):
+        bind.dispose()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs per worker when the server starts, not on import, so importing
+    # this module (tools, tests) needs no database
+    await run_in_threadpool(start_up)
+    yield
+    await shut_down()
 
-# Test database connection BEFORE creating tables
-print("=" * 50)
-print("Starting Elite Motors API...")
-print("=" * 50)
-
-if not test_connection():
-    print("\nCannot start server - database connection failed")
-    print("Make sure Docker PostgreSQL is running:")
-    print("   docker-compose up -d")
-    print("   docker ps")
-    sys.exit(1)
-
-# Create all database tables (INCLUDING users table)
-try:
-    print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("Database tables created successfully!")
-except Exception as e:
-    print(f"Failed to create tables: {e}")
-    sys.exit(1)
 
 # Create FastAPI app
-app = FastAPI(title="Elite Motors API", version="1.0.0")
+app = FastAPI(title="Elite Motors API", version="1.0.0", lifespan=lifespan)
+
+# Per-IP / per-account limits on login, register and contact. Added first so it
+# runs inside CORS (429s stay readable by the browser) but before routing
+app.add_middleware(ratelimit.RateLimitMiddleware)
+
+# With read replicas: a client that just wrote keeps reading from the primary
+app.add_middleware(database.ReadYourWritesMiddleware)
 
 # Enable CORS
 app.add_middleware(
@@ -45,6 +121,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request count / in-flight / latency per route, exposed at /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+# On-demand sampling profiles (admin endpoints below, or the X-Profile header)
+app.add_middleware(profiler.ProfilerMiddleware)
+
 # ============= AUTHENTICATION ENDPOINTS =============
 
 class UserCreate(BaseModel):
@@ -71,18 +152,18 @@ class Token(BaseModel):
     user: UserResponse
 
 @app.post("/api/auth/register", response_model=UserResponse)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
     # Check if email already exists
-    if db.query(models.User).filter(models.User.email == user_data.email).first():
+    if await db.scalar(select(models.User.id).where(models.User.email == user_data.email)):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Check if username already exists
-    if db.query(models.User).filter(models.User.username == user_data.username).first():
+    if await db.scalar(select(models.User.id).where(models.User.username == user_data.username)):
         raise HTTPException(status_code=400, detail="Username already taken")
     
-    # Create new user
-    hashed_password = auth.get_password_hash(user_data.password)
+    # Create new user (bcrypt runs on the password pool, not in the event loop)
+    hashed_password = await passwords.hash_password_async(user_data.password)
     new_user = models.User(
         email=user_data.email,
         username=user_data.username,
@@ -92,24 +173,31 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     return new_user.to_dict()
 
 @app.post("/api/auth/login", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Login and get JWT token"""
     # Find user by email or username
-    user = db.query(models.User).filter(
-        (models.User.email == form_data.username) | 
-        (models.User.username == form_data.username)
-    ).first()
+    user = await db.scalar(select(models.User).where(
+        or_(
+            models.User.email == form_data.username,
+            models.User.username == form_data.username
+        )
+    ))
     
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    valid = False
+    if user:
+        valid, new_hash = await passwords.verify_password_async(
+            form_data.password, user.hashed_password
+        )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email/username or password",
@@ -119,24 +207,18 @@ def login(
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     
-    # DEBUG: Print user object
-    print(f"\n=== LOGIN DEBUG ===")
-    print(f"User object: {user}")
-    print(f"User.created_at from DB: {user.created_at}")
-    print(f"User.created_at type: {type(user.created_at)}")
+    # Stored hash used an older bcrypt cost: replace it transparently
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+        await db.refresh(user)
     
-    # Convert to dict
     user_dict = user.to_dict()
-    print(f"User dict: {user_dict}")
-    print(f"created_at in dict: {user_dict.get('created_at')}")
-    print(f"===================\n")
-    
-    # Create access token
-    access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth.create_access_token(
-        data={"sub": user.email},
-        expires_delta=access_token_expires
-    )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Login: user id=%s username=%s dict=%s", user.id, user.username, user_dict)
+    
+    # Create access token (id/role/active travel in the claims)
+    access_token = auth.create_user_token(user)
     
     response_data = {
         "access_token": access_token,
@@ -144,14 +226,18 @@ def login(
         "user": user_dict
     }
     
-    print(f"Response data being sent: {response_data}")
-    
     return response_data
 
 @app.get("/api/auth/me", response_model=UserResponse)
-def get_current_user_info(current_user: models.User = Depends(auth.get_current_active_user)):
+async def get_current_user_info(
+    current_user: auth.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get current logged-in user info"""
-    return current_user.to_dict()
+    user = await db.get(models.User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    return user.to_dict()
 
 # Pydantic models for request/response validation
 class CarSpecs(BaseModel):
@@ -180,10 +266,36 @@ class CarResponse(BaseModel):
     featured: bool
     description: str
     specs: CarSpecs
+    color: Optional[str] = None
 
     class Config:
         from_attributes = True
 
+class CarPage(BaseModel):
+    items: List[CarResponse]
+    next_cursor: Optional[str] = None
+
+# Used by the cached single-car endpoint, which serializes once and then serves bytes
+car_adapter = TypeAdapter(CarResponse)
+
+def dump_json(adapter: TypeAdapter, data) -> bytes:
+    """Validate and serialize like response_model would"""
+    with metrics.serialization_timer():
+        return adapter.dump_json(adapter.validate_python(data))
+
+def dump_rows(data) -> bytes:
+    """Serialize readmodels rows (already in CarResponse shape) without re-validation"""
+    with metrics.serialization_timer():
+        return readmodels.dumps(data)
+
+async def car_rows_by_id(db: AsyncSession, ids: List[int]) -> list:
+    """readmodels rows of the given cars, in the order of `ids` (missing ones skipped)"""
+    if not ids:
+        return []
+    rows = (await db.execute(readmodels.car_select().where(models.Car.id.in_(ids)))).all()
+    position = {car_id: i for i, car_id in enumerate(ids)}
+    return sorted(readmodels.car_rows(rows), key=lambda car: position[car.id])
+
 # ============= API ENDPOINTS =============
 
 @app.get("/")
@@ -194,17 +306,73 @@ def read_root():
         "docs": "/docs"
     }
 
-@app.get("/api/cars", response_model=List[CarResponse])
-def get_all_cars(db: Session = Depends(get_db)):
-    """Get all cars from database - PUBLIC endpoint"""
-    cars = db.query(models.Car).all()
-    return [car.to_dict() for car in cars]
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(_: None = Depends(auth.require_metrics_access)):
+    """Prometheus-style metrics (METRICS_TOKEN bearer token or Admin only)"""
+    return PlainTextResponse(metrics.exposition(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/cars", response_model=Union[List[CarResponse], CarPage])
+async def get_all_cars(
+    request: Request,
+    filters: search.CarFilters = Depends(),
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=search.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_async_db)
+):
+    """
+    Get cars from database - PUBLIC endpoint.
+    Without `limit`/`cursor` this returns the whole (filtered) list as before.
+    With them it returns one keyset-paginated page and an opaque `next_cursor`.
+    """
+    async def build():
+        stmt = search.apply_filters(readmodels.car_select(), filters)
+
+        if limit is None and cursor is None:
+            if sort:
+                stmt = search.apply_sort(stmt, sort)
+            cars = readmodels.car_rows((await db.execute(stmt)).all())
+            return dump_rows(cars)
+
+        page_sort = sort or search.DEFAULT_SORT
+        page_size = limit or search.DEFAULT_PAGE_SIZE
+        page = None
+        if inventory is not None:
+            # Filter/sort in the columnar snapshot, then fetch the page by primary key
+            page = await run_in_threadpool(inventory.page, filters, page_sort, page_size, cursor)
+        if page is not None:
+            ids, next_cursor = page
+            cars = await car_rows_by_id(db, ids)
+        else:
+            stmt = search.page_statement(stmt, page_sort, page_size, cursor)
+            cars = readmodels.car_rows((await db.execute(stmt)).all())
+            cars, next_cursor = search.split_page(cars, page_sort, page_size)
+        return dump_rows({"items": cars, "next_cursor": next_cursor})
+
+    inventory = snapshot.inventory if snapshot.inventory and snapshot.inventory.loaded else None
+    # Pages of a snapshot that has reloaded since are not served again
+    key = ("cars", filters.cache_key(), sort, limit, cursor, inventory.version if inventory else None)
+    return await cache.cached_response(request, key, build)
+
+@app.get("/api/cars/facets")
+async def get_car_facets(
+    request: Request,
+    filters: search.CarFilters = Depends(),
+    db: AsyncSession = Depends(get_read_async_db)
+):
+    """Facet counts and price/year/mileage histograms for a filter set - PUBLIC endpoint"""
+    async def build():
+        rows = (await db.execute(facets.facets_statement(filters))).all()
+        with metrics.serialization_timer():
+            return json.dumps(facets.build_facets(rows)).encode()
+
+    return await cache.cached_response(request, ("facets", filters.cache_key()), build)
 
 @app.post("/api/cars", response_model=CarResponse)
 def create_car(
     car: CarCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.require_owner)
+    current_user: auth.Principal = Depends(auth.require_owner)
 ):
     """Add a new car (Owner or Admin only)"""
     db_car = models.Car(
@@ -224,29 +392,167 @@ def create_car(
     db.add(db_car)
     db.commit()
     db.refresh(db_car)
+    cache.catalog_cache.invalidate_lists()
+    suggest.index.put(db_car)
+    if snapshot.inventory:
+        snapshot.inventory.put(db_car)
+    if similar.index:
+        similar.index.put(db_car)
     
     return db_car.to_dict()
 
+@app.post("/api/cars/import")
+def import_cars(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv or ndjson (default: from the file name)"),
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.require_owner)
+):
+    """
+    Bulk-add cars from a CSV or NDJSON upload (Owner or Admin only).
+    CSV columns: name, price, year, mileage, image, featured, description,
+    engine, transmission, fuel, color. NDJSON lines may use the POST /api/cars
+    body shape instead. Invalid rows are skipped and listed in the report.
+    """
+    fmt = format or importer.detect_format(file.filename, file.content_type)
+    if fmt not in importer.FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format. Must be one of: {', '.join(importer.FORMATS)}"
+        )
+
+    report = importer.import_cars(db, file.file, fmt, CarCreate)
+    if report["inserted"]:
+        cache.catalog_cache.invalidate_lists()
+        if snapshot.inventory:
+            snapshot.inventory.refresh(engine, blocking=True)
+        if similar.index:
+            similar.index.refresh(engine)
+    return report
+
+@app.get("/api/cars/search", response_model=List[CarResponse])
+async def search_cars(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description='e.g. "twin-turbo coupe"'),
+    filters: search.CarFilters = Depends(),
+    limit: int = Query(search.DEFAULT_PAGE_SIZE, ge=1, le=search.MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=1000),
+    db: AsyncSession = Depends(get_read_async_db)
+):
+    """Full-text search, best match first, combinable with the inventory filters"""
+    if fulltext.backend is None:
+        raise HTTPException(status_code=501, detail="Search is not available on this database")
+
+    async def build():
+        stmt = fulltext.search_statement(q, filters, limit, offset)
+        cars = readmodels.car_rows((await db.execute(stmt)).all()) if stmt is not None else []
+        return dump_rows(cars)
+
+    key = ("search", q.strip().lower(), filters.cache_key(), limit, offset)
+    return await cache.cached_response(request, key, build)
+
+@app.get("/api/cars/suggest")
+async def suggest_cars(
+    q: str = Query(..., max_length=100),
+    limit: int = Query(suggest.SUGGEST_DEFAULT_LIMIT, ge=1, le=suggest.SUGGEST_MAX_LIMIT)
+):
+    """Typeahead: brands, models, engines and colors with a word starting with q"""
+    return suggest.index.suggest(q, limit)
+
 @app.get("/api/cars/featured", response_model=List[CarResponse])
-def get_featured_cars(db: Session = Depends(get_db)):
+async def get_featured_cars(request: Request, db: AsyncSession = Depends(get_read_async_db)):
     """Get only featured cars"""
-    cars = db.query(models.Car).filter(models.Car.featured == True).all()
-    return [car.to_dict() for car in cars]
+    async def build():
+        stmt = readmodels.car_select().where(models.Car.featured == True)
+        cars = readmodels.car_rows((await db.execute(stmt)).all())
+        return dump_rows(cars)
+
+    return await cache.cached_response(request, ("featured",), build)
 
 @app.get("/api/cars/{car_id}", response_model=CarResponse)
-def get_car_by_id(car_id: int, db: Session = Depends(get_db)):
+async def get_car_by_id(car_id: int, request: Request, db: AsyncSession = Depends(get_read_async_db)):
     """Get a specific car by ID"""
-    car = db.query(models.Car).filter(models.Car.id == car_id).first()
-    if car is None:
+    async def build():
+        car = await db.get(models.Car, car_id)
+        if car is None:
+            raise HTTPException(status_code=404, detail="Car not found")
+        return dump_json(car_adapter, car.to_dict())
+
+    return await cache.cached_response(request, ("car", car_id), build)
+
+@app.get("/api/cars/{car_id}/similar", response_model=List[CarResponse])
+async def get_similar_cars(
+    car_id: int,
+    request: Request,
+    limit: int = Query(similar.SIMILAR_DEFAULT_LIMIT, ge=1, le=similar.SIMILAR_K),
+    db: AsyncSession = Depends(get_read_async_db)
+):
+    """Most similar listings (price, year, mileage, brand, fuel, transmission, color)"""
+    if not similar.index:
+        raise HTTPException(status_code=501, detail="Similar cars are not available")
+    if not similar.index.loaded:
+        raise HTTPException(status_code=503, detail="Similar cars are still being computed",
+                            headers={"Retry-After": "5"})
+
+    async def build():
+        ids = similar.index.similar(car_id, limit)
+        if ids is None:
+            # Added by another worker since the last sync: compute its neighbours now
+            car = await db.get(models.Car, car_id)
+            if car is None:
+                raise HTTPException(status_code=404, detail="Car not found")
+            await run_in_threadpool(similar.index.put, car)
+            ids = similar.index.similar(car_id, limit)
+        return dump_rows(await car_rows_by_id(db, ids))
+
+    return await cache.cached_response(request, ("similar", car_id, limit), build)
+
+@app.get("/api/cars/{car_id}/also-liked", response_model=List[CarResponse])
+async def get_also_liked_cars(
+    car_id: int,
+    limit: int = Query(covisit.COVISIT_DEFAULT_LIMIT, ge=1, le=covisit.COVISIT_MAX_LIMIT),
+    db: AsyncSession = Depends(get_read_async_db)
+):
+    """Cars most often saved to favorites together with this one"""
+    cars = await car_rows_by_id(db, covisit.index.also_liked(car_id, limit))
+    return Response(content=dump_rows(cars), media_type="application/json")
+
+@app.get("/api/cars/{car_id}/availability")
+async def get_car_availability(
+    car_id: int,
+    day: Optional[str] = Query(None, alias="date", description="YYYY-MM-DD, default today"),
+    days: int = Query(1, ge=1, le=scheduler.AVAILABILITY_MAX_DAYS),
+    location: Optional[str] = None,
+    next_slots: int = Query(3, ge=0, le=20, description="How many next free slots to list"),
+    db: AsyncSession = Depends(get_read_async_db)
+):
+    """Test drive slots of a car for a date range, plus its next free slots"""
+    now = datetime.now()
+    first_day = scheduler.parse_date(day) if day else now.date()
+    if first_day is None:
+        raise HTTPException(status_code=400, detail="Invalid date. Use YYYY-MM-DD")
+    location = scheduler.resolve_location(location)
+    if await db.get(models.Car, car_id) is None:
         raise HTTPException(status_code=404, detail="Car not found")
-    return car.to_dict()
+    
+    after = max(now, datetime.combine(first_day, datetime.min.time()))
+    return {
+        "car_id": car_id,
+        "location": location,
+        "slot_minutes": scheduler.SLOT_MINUTES,
+        "days": scheduler.index.availability(car_id, location, first_day, days, now),
+        "next_available": [
+            {"date": start.date().isoformat(), "time": scheduler.format_time(start.time()), "start": start.isoformat()}
+            for start in scheduler.index.next_free(car_id, location, after, next_slots)
+        ],
+    }
 
 @app.put("/api/cars/{car_id}", response_model=CarResponse)
 def update_car(
     car_id: int,
     car: CarCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.require_owner)
+    current_user: auth.Principal = Depends(auth.require_owner)
 ):
     """Update an existing car (Owner or Admin only)"""
     db_car = db.query(models.Car).filter(models.Car.id == car_id).first()
@@ -267,6 +573,12 @@ def update_car(
     
     db.commit()
     db.refresh(db_car)
+    cache.catalog_cache.invalidate_car(car_id)
+    suggest.index.put(db_car)
+    if snapshot.inventory:
+        snapshot.inventory.put(db_car)
+    if similar.index:
+        similar.index.put(db_car)
     
     return db_car.to_dict()
 
@@ -274,15 +586,25 @@ def update_car(
 def delete_car(
     car_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.require_owner)
+    current_user: auth.Principal = Depends(auth.require_owner)
 ):
     """Delete a car (Owner or Admin only)"""
     db_car = db.query(models.Car).filter(models.Car.id == car_id).first()
     if db_car is None:
         raise HTTPException(status_code=404, detail="Car not found")
     
+    fans = [user_id for (user_id,) in db.query(models.Favorite.user_id).filter(models.Favorite.car_id == car_id)]
+    bookings = [td_id for (td_id,) in db.query(models.TestDrive.id).filter(models.TestDrive.car_id == car_id)]
     db.delete(db_car)
     db.commit()
+    scheduler.index.release_many(bookings)
+    cache.catalog_cache.invalidate_car(car_id)
+    covisit.index.remove_car(car_id, fans)
+    suggest.index.remove(car_id)
+    if snapshot.inventory:
+        snapshot.inventory.remove(car_id)
+    if similar.index:
+        similar.index.remove(car_id)
     
     return {"success": True, "message": "Car deleted successfully"}
 
@@ -379,6 +701,11 @@ def seed_database(db: Session = Depends(get_db)):
         db.add(db_car)
     
     db.commit()
+    cache.catalog_cache.invalidate_all()
+    if snapshot.inventory:
+        snapshot.inventory.refresh(engine, blocking=True)
+    if similar.index:
+        similar.index.refresh(engine)
     
     return {"message": f"Added {len(sample_cars)} cars to database"}
 
@@ -392,7 +719,7 @@ def update_user_role(
     user_id: int,
     role_data: RoleUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.require_admin)
+    current_user: auth.Principal = Depends(auth.require_admin)
 ):
     """Update user role (Admin only)"""
     if role_data.role not in ['user', 'admin', 'owner']:
@@ -403,25 +730,82 @@ def update_user_role(
         raise HTTPException(status_code=404, detail="User not found")
     
     user.role = role_data.role
+    # Tokens carry the role: make the user log in again to pick up the new one
+    auth.revoke_user_tokens(db, user_id)
     db.commit()
     db.refresh(user)
     
     return user.to_dict()
 
+@app.get("/api/admin/cache")
+def get_cache_stats(current_user: auth.Principal = Depends(auth.require_admin)):
+    """Catalog cache hit/miss/eviction counters (Admin only)"""
+    return cache.catalog_cache.stats()
+
+@app.get("/api/admin/db-pool")
+def get_db_pool_stats(current_user: auth.Principal = Depends(auth.require_admin)):
+    """Connection pool settings, occupancy and checkout wait times (Admin only)"""
+    return database.pool_stats()
+
+@app.post("/api/admin/profile")
+def start_profile(
+    seconds: float = Query(10, gt=0, le=profiler.PROFILE_MAX_SECONDS),
+    route: Optional[str] = Query(None, description="Route template, e.g. /api/owner/test-drives"),
+    requests: Optional[int] = Query(None, ge=1, le=10000),
+    current_user: auth.Principal = Depends(auth.require_admin)
+):
+    """
+    Start a sampling profile (Admin only): every thread for `seconds`, or the
+    next `requests` requests (matching `route` if given) within `seconds`
+    """
+    if route is not None and requests is None:
+        raise HTTPException(status_code=400, detail="route requires requests")
+    session = profiler.start(seconds, route, requests)
+    if session is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    return session.info()
+
+@app.get("/api/admin/profile")
+def list_profiles(current_user: auth.Principal = Depends(auth.require_admin)):
+    """Running and recent profiles (Admin only)"""
+    return profiler.list_profiles()
+
+@app.post("/api/admin/profile/stop")
+def stop_profile(current_user: auth.Principal = Depends(auth.require_admin)):
+    """Stop the running profile early (Admin only)"""
+    session = profiler.current()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profile is running")
+    profiler.stop()
+    return {"id": session.id}
+
+@app.get("/api/admin/profile/{profile_id}")
+def get_profile(profile_id: int, current_user: auth.Principal = Depends(auth.require_admin)):
+    """
+    Collapsed stacks of a finished profile (Admin only), ready for
+    flamegraph.pl or speedscope; 202 with the status while it runs
+    """
+    session = profiler.get(profile_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if session.finished_at is None:
+        return JSONResponse(session.info(), status_code=202)
+    return PlainTextResponse(session.collapsed())
+
 @app.get("/api/admin/users")
-def get_all_users(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.require_admin)
+async def get_all_users(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.require_admin)
 ):
     """Get all users (Admin only)"""
-    users = db.query(models.User).all()
+    users = (await db.execute(select(models.User))).scalars().all()
     return [user.to_dict() for user in users]
 
 @app.delete("/api/admin/users/{user_id}")
 def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.require_admin)
+    current_user: auth.Principal = Depends(auth.require_admin)
 ):
     """Delete a user (Admin only)"""
     if user_id == current_user.id:
@@ -432,8 +816,16 @@ def delete_user(
         raise HTTPException(status_code=404, detail="User not found")
     
     username = user.username
+    test_drives = db.query(models.TestDrive).filter(models.TestDrive.user_id == user_id).all()
+    bookings = [test_drive.id for test_drive in test_drives]
+    # Their test drives go with them (cascade): uncount them in the same transaction
+    for test_drive in test_drives:
+        rollups.record(db, test_drive, -1)
     db.delete(user)
+    auth.revoke_user_tokens(db, user_id)
     db.commit()
+    scheduler.index.release_many(bookings)
+    covisit.index.remove_user(user_id)
     
     return {"success": True, "message": f"User {username} deleted successfully"}
 
@@ -448,6 +840,7 @@ class TestDriveCreate(BaseModel):
     preferred_time: str
     phone: str
     message: str = ""
+    location: Optional[str] = None
 
 class ContactInquiryCreate(BaseModel):
     name: str
@@ -457,32 +850,33 @@ class ContactInquiryCreate(BaseModel):
     message: str
 
 @app.get("/api/user/favorites")
-def get_user_favorites(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+async def get_user_favorites(
+    db: AsyncSession = Depends(get_read_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
     """Get current user's favorite cars"""
-    favorites = db.query(models.Favorite).filter(
+    stmt = select(models.Favorite).options(
+        joinedload(models.Favorite.car)
+    ).where(
         models.Favorite.user_id == current_user.id
-    ).all()
-    
-    result = []
-    for fav in favorites:
-        car = db.query(models.Car).filter(models.Car.id == fav.car_id).first()
-        if car:
-            result.append({
-                "favorite_id": fav.id,
-                "car": car.to_dict(),
-                "added_at": fav.created_at.isoformat() if fav.created_at else None
-            })
+    )
+    favorites = (await db.execute(stmt)).scalars().all()
     
-    return result
+    return [
+        {
+            "favorite_id": fav.id,
+            "car": fav.car.to_dict(),
+            "added_at": fav.created_at.isoformat() if fav.created_at else None
+        }
+        for fav in favorites
+        if fav.car
+    ]
 
 @app.post("/api/user/favorites")
 def add_favorite(
     favorite: FavoriteCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
     """Add a car to favorites"""
     existing = db.query(models.Favorite).filter(
@@ -505,6 +899,7 @@ def add_favorite(
     db.add(new_favorite)
     db.commit()
     db.refresh(new_favorite)
+    covisit.index.add(current_user.id, favorite.car_id)
     
     return {"success": True, "message": "Car added to favorites"}
 
@@ -512,7 +907,7 @@ def add_favorite(
 def remove_favorite(
     car_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
     """Remove a car from favorites"""
     favorite = db.query(models.Favorite).filter(
@@ -525,60 +920,107 @@ def remove_favorite(
     
     db.delete(favorite)
     db.commit()
+    covisit.index.remove(current_user.id, car_id)
     
     return {"success": True, "message": "Car removed from favorites"}
 
+@app.get("/api/user/recommendations", response_model=List[CarResponse])
+async def get_user_recommendations(
+    limit: int = Query(12, ge=1, le=covisit.COVISIT_MAX_LIMIT),
+    db: AsyncSession = Depends(get_read_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    """Cars saved by users with similar favorites, excluding the user's own favorites"""
+    cars = await car_rows_by_id(db, covisit.index.recommend(current_user.id, limit))
+    return Response(content=dump_rows(cars), media_type="application/json")
+
 @app.get("/api/user/test-drives")
-def get_user_test_drives(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+async def get_user_test_drives(
+    db: AsyncSession = Depends(get_read_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
     """Get current user's test drive requests"""
-    test_drives = db.query(models.TestDrive).filter(
+    stmt = select(models.TestDrive).options(
+        joinedload(models.TestDrive.car)
+    ).where(
         models.TestDrive.user_id == current_user.id
-    ).order_by(models.TestDrive.created_at.desc()).all()
+    ).order_by(models.TestDrive.created_at.desc())
+    test_drives = (await db.execute(stmt)).scalars().all()
     
-    result = []
-    for td in test_drives:
-        car = db.query(models.Car).filter(models.Car.id == td.car_id).first()
-        if car:
-            result.append({
-                **td.to_dict(),
-                "car": car.to_dict()
-            })
-    
-    return result
+    return [
+        {
+            **td.to_dict(),
+            "car": td.car.to_dict()
+        }
+        for td in test_drives
+        if td.car
+    ]
 
 @app.post("/api/user/test-drives")
 def request_test_drive(
     test_drive: TestDriveCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
     """Request a test drive"""
     car = db.query(models.Car).filter(models.Car.id == test_drive.car_id).first()
     if not car:
         raise HTTPException(status_code=404, detail="Car not found")
     
+    slot_start = scheduler.slot_start(test_drive.preferred_date, test_drive.preferred_time)
+    location = scheduler.resolve_location(test_drive.location)
+    # Takes the slot in the index first, so two requests can't both pass the check
+    hold = scheduler.index.hold(car.id, location, slot_start)
+    
     new_test_drive = models.TestDrive(
         user_id=current_user.id,
         car_id=test_drive.car_id,
         preferred_date=test_drive.preferred_date,
         preferred_time=test_drive.preferred_time,
+        slot_start=slot_start,
+        location=location,
         phone=test_drive.phone,
         message=test_drive.message,
         status='pending'
     )
     
-    db.add(new_test_drive)
-    db.commit()
-    db.refresh(new_test_drive)
+    confirmed = False
+    try:
+        db.add(new_test_drive)
+        db.flush()
+        test_drive_id = new_test_drive.id
+        # The index only knows this worker's view; the database has the final say
+        scheduler.check_location_capacity(db, location, slot_start)
+        rollups.record(db, new_test_drive, 1)
+        db.commit()
+        scheduler.index.confirm(hold, test_drive_id)
+        confirmed = True
+    except IntegrityError:
+        # Booked meanwhile through another worker
+        db.rollback()
+        raise HTTPException(status_code=409, detail="This car is already booked for that time slot")
+    finally:
+        # Any failure before the confirm frees the slot again
+        if not confirmed:
+            scheduler.index.release(hold)
     
     return {"success": True, "message": "Test drive request submitted successfully"}
 
 @app.post("/api/contact")
 def submit_contact_inquiry(inquiry: ContactInquiryCreate, db: Session = Depends(get_db)):
     """Submit a contact inquiry"""
+    if writebehind.WRITE_BEHIND_ENABLED:
+        # Acknowledged once queued; written with other inquiries in one batch
+        writebehind.submit_contact_inquiry({
+            "user_id": None,
+            "name": inquiry.name,
+            "email": inquiry.email,
+            "phone": inquiry.phone,
+            "subject": inquiry.subject,
+            "message": inquiry.message,
+        })
+        return {"success": True, "message": "Your message has been sent. We'll get back to you soon!"}
+
     new_inquiry = models.ContactInquiry(
         user_id=None,
         name=inquiry.name,
@@ -596,32 +1038,33 @@ def submit_contact_inquiry(inquiry: ContactInquiryCreate, db: Session = Depends(
 # ============= OWNER TEST DRIVE MANAGEMENT =============
 
 @app.get("/api/owner/test-drives")
-def get_all_test_drives(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.require_owner)
+async def get_all_test_drives(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.require_owner)
 ):
     """Get all test drive requests (Owner or Admin only)"""
-    test_drives = db.query(models.TestDrive).order_by(
+    # Cars and users come in the same query instead of two lookups per row
+    stmt = select(models.TestDrive).options(
+        joinedload(models.TestDrive.car),
+        joinedload(models.TestDrive.user)
+    ).order_by(
         models.TestDrive.created_at.desc()
-    ).all()
-    
-    result = []
-    for td in test_drives:
-        car = db.query(models.Car).filter(models.Car.id == td.car_id).first()
-        user = db.query(models.User).filter(models.User.id == td.user_id).first()
-        
-        result.append({
+    )
+    test_drives = (await db.execute(stmt)).scalars().all()
+    
+    return [
+        {
             **td.to_dict(),
-            "car": car.to_dict() if car else None,
+            "car": td.car.to_dict() if td.car else None,
             "user": {
-                "id": user.id,
-                "username": user.username,
-                "full_name": user.full_name,
-                "email": user.email
-            } if user else None
-        })
-    
-    return result
+                "id": td.user.id,
+                "username": td.user.username,
+                "full_name": td.user.full_name,
+                "email": td.user.email
+            } if td.user else None
+        }
+        for td in test_drives
+    ]
 
 
 class TestDriveStatusUpdate(BaseModel):
@@ -632,7 +1075,7 @@ def update_test_drive_status(
     test_drive_id: int,
     status_data: TestDriveStatusUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.require_owner)
+    current_user: auth.Principal = Depends(auth.require_owner)
 ):
     """Update test drive status (Owner or Admin only)"""
     
@@ -644,17 +1087,48 @@ def update_test_drive_status(
             detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
         )
     
-    # Find test drive
+    # Find test drive, locked until the commit so concurrent updates see each
+    # other's status and the rollups move once per actual change
     test_drive = db.query(models.TestDrive).filter(
         models.TestDrive.id == test_drive_id
-    ).first()
+    ).with_for_update().first()
     
     if not test_drive:
         raise HTTPException(status_code=404, detail="Test drive not found")
     
-    # Update status
+    was_active = test_drive.status in scheduler.ACTIVE_STATUSES
+    now_active = status_data.status in scheduler.ACTIVE_STATUSES
+    hold = None
+    if now_active and not was_active and test_drive.slot_start is not None:
+        # A cancelled drive coming back needs its slot to still be free
+        hold = scheduler.index.hold(
+            test_drive.car_id, test_drive.location or scheduler.LOCATIONS[0], test_drive.slot_start
+        )
+    
+    # Update status (and move the drive between rollup counters)
+    if test_drive.status != status_data.status:
+        rollups.record(db, test_drive, -1)
+        rollups.record(db, test_drive, 1, status=status_data.status)
     test_drive.status = status_data.status
-    db.commit()
+    confirmed = False
+    try:
+        if hold is not None:
+            db.flush()
+            scheduler.check_location_capacity(
+                db, test_drive.location or scheduler.LOCATIONS[0], test_drive.slot_start
+            )
+        db.commit()
+        if hold is not None:
+            scheduler.index.confirm(hold, test_drive_id)
+            confirmed = True
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="This car is already booked for that time slot")
+    finally:
+        if hold is not None and not confirmed:
+            scheduler.index.release(hold)
+    if was_active and not now_active:
+        scheduler.index.release(test_drive_id)
     db.refresh(test_drive)
     
     return {
@@ -668,56 +1142,120 @@ def update_test_drive_status(
 def delete_test_drive(
     test_drive_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.require_owner)
+    current_user: auth.Principal = Depends(auth.require_owner)
 ):
     """Delete a test drive request (Owner or Admin only)"""
     
     test_drive = db.query(models.TestDrive).filter(
         models.TestDrive.id == test_drive_id
-    ).first()
+    ).with_for_update().first()
     
     if not test_drive:
         raise HTTPException(status_code=404, detail="Test drive not found")
     
+    rollups.record(db, test_drive, -1)
     db.delete(test_drive)
     db.commit()
+    scheduler.index.release(test_drive_id)
     
     return {"success": True, "message": "Test drive deleted successfully"}
 
 
 @app.get("/api/owner/test-drives/stats")
-def get_test_drive_stats(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.require_owner)
+async def get_test_drive_stats(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.require_owner)
 ):
     """Get test drive statistics (Owner or Admin only)"""
     
-    total = db.query(models.TestDrive).count()
-    pending = db.query(models.TestDrive).filter(
-        models.TestDrive.status == 'pending'
-    ).count()
-    approved = db.query(models.TestDrive).filter(
-        models.TestDrive.status == 'approved'
-    ).count()
-    completed = db.query(models.TestDrive).filter(
-        models.TestDrive.status == 'completed'
-    ).count()
-    cancelled = db.query(models.TestDrive).filter(
-        models.TestDrive.status == 'cancelled'
-    ).count()
+    stmt = select(
+        models.TestDrive.status, func.count(models.TestDrive.id)
+    ).group_by(models.TestDrive.status)
+    counts = dict((await db.execute(stmt)).all())
     
     return {
-        "total": total,
-        "pending": pending,
-        "approved": approved,
-        "completed": completed,
-        "cancelled": cancelled
+        "total": sum(counts.values()),
+        "pending": counts.get('pending', 0),
+        "approved": counts.get('approved', 0),
+        "completed": counts.get('completed', 0),
+        "cancelled": counts.get('cancelled', 0)
     }
 
+
+@app.get("/api/owner/test-drives/rollups")
+def get_test_drive_rollups(
+    period: str = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    car_id: Optional[int] = None,
+    by_car: bool = False,
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.require_owner)
+):
+    """Daily or weekly test drive counts by status, optionally per car (Owner or Admin only)"""
+    if period not in rollups.PERIODS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid period. Must be one of: {', '.join(rollups.PERIODS)}"
+        )
+    
+    return rollups.get_rollups(db, period, start, end, car_id, by_car)
+
+
+@app.post("/api/owner/test-drives/rollups/rebuild")
+def rebuild_test_drive_rollups(
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.require_owner)
+):
+    """Recompute the rollup table from all test drives (Owner or Admin only)"""
+    rows = rollups.rebuild(db)
+    return {"success": True, "message": f"Rebuilt {rows} rollup rows"}
+
+# ============= EXPORT ENDPOINTS =============
+
+@app.get("/api/owner/export/cars")
+def export_cars(
+    format: str = Query("csv", description="csv or ndjson"),
+    filters: search.CarFilters = Depends(),
+    current_user: auth.Principal = Depends(auth.require_owner)
+):
+    """Stream the inventory (same filters as /api/cars) as CSV or NDJSON (Owner or Admin only)"""
+    return exporter.response("cars", format, search.filter_conditions(filters))
+
+@app.get("/api/owner/export/test-drives")
+def export_test_drives(
+    format: str = Query("csv", description="csv or ndjson"),
+    status: Optional[str] = None,
+    car_id: Optional[int] = None,
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+    current_user: auth.Principal = Depends(auth.require_owner)
+):
+    """Stream test drive requests as CSV or NDJSON (Owner or Admin only)"""
+    TestDrive = models.TestDrive
+    conditions = exporter.created_conditions(TestDrive, created_from, created_to)
+    if status:
+        conditions.append(TestDrive.status == status)
+    if car_id is not None:
+        conditions.append(TestDrive.car_id == car_id)
+    return exporter.response("test_drives", format, conditions)
+
+@app.get("/api/owner/export/contact-inquiries")
+def export_contact_inquiries(
+    format: str = Query("csv", description="csv or ndjson"),
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+    current_user: auth.Principal = Depends(auth.require_owner)
+):
+    """Stream contact form submissions as CSV or NDJSON (Owner or Admin only)"""
+    conditions = exporter.created_conditions(models.ContactInquiry, created_from, created_to)
+    return exporter.response("contact_inquiries", format, conditions)
+
+
 if __name__ == "__main__":
     import uvicorn
     print("\n" + "=" * 50)
     print("🚀 Starting server on http://localhost:8000")
     print("📚 API Docs: http://localhost:8000/docs")
     print("=" * 50 + "\n")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
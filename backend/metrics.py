@@ -0,0 +1,243 @@
+# backend/metrics.py
+import contextvars
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from log import get_logger
+
+logger = get_logger("metrics")
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Statements per request
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 25, 50, 100, 250)
+
+# The same statement this many times in one request is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+# APP_ENV=dev adds X-DB-Queries / X-DB-Time-Ms / X-DB-N-Plus-One to every response
+DEV_HEADERS = os.getenv("APP_ENV", "production") == "dev"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def exposition(self, name: str, labels: str) -> list:
+        lines = []
+        cumulative = 0
+        prefix = labels + "," if labels else ""
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class RequestStats:
+    """Per-request timings, filled in by the DB hooks and the serializers"""
+    __slots__ = ("db_time", "db_statements", "statement_counts", "serialize_time")
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.db_statements = 0
+        self.statement_counts = Counter()  # SQL text -> executions
+        self.serialize_time = 0.0
+
+    def repeated_statements(self) -> list:
+        """Statements executed N_PLUS_ONE_THRESHOLD+ times (likely N+1), as (sql, count)"""
+        return [
+            (statement, count)
+            for statement, count in self.statement_counts.items()
+            if count >= N_PLUS_ONE_THRESHOLD
+        ]
+
+
+# Stats of the request being handled (None outside of a request)
+current_request = contextvars.ContextVar("current_request", default=None)
+
+_lock = threading.Lock()
+_requests = {}  # (method, route, status) -> count
+_durations = {}  # (method, route, status) -> Histogram
+_db_durations = {}  # (method, route) -> Histogram
+_serialize_durations = {}  # (method, route) -> Histogram
+_db_statements = {}  # (method, route) -> Histogram
+_n_plus_one = {}  # (method, route) -> requests with a repeated statement
+_n_plus_one_logged = set()  # (method, route, sql) already logged
+_slow_queries = 0
+_rate_limited = {}  # (rule, key kind) -> rejected requests
+_collectors = []  # functions returning extra exposition lines (other modules' gauges)
+_in_flight = 0
+
+
+def _histogram(store: dict, key: tuple, bounds=LATENCY_BUCKETS) -> Histogram:
+    histogram = store.get(key)
+    if histogram is None:
+        histogram = store[key] = Histogram(bounds)
+    return histogram
+
+
+def record_request(method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+    repeated = stats.repeated_statements() if stats.db_statements >= N_PLUS_ONE_THRESHOLD else []
+    with _lock:
+        key = (method, route, str(status))
+        _requests[key] = _requests.get(key, 0) + 1
+        _histogram(_durations, key).observe(elapsed)
+        _histogram(_db_durations, (method, route)).observe(stats.db_time)
+        _histogram(_db_statements, (method, route), STATEMENT_BUCKETS).observe(stats.db_statements)
+        _histogram(_serialize_durations, (method, route)).observe(stats.serialize_time)
+        if repeated:
+            _n_plus_one[(method, route)] = _n_plus_one.get((method, route), 0) + 1
+        new = [(sql, count) for sql, count in repeated if (method, route, sql) not in _n_plus_one_logged]
+        _n_plus_one_logged.update((method, route, sql) for sql, _ in new)
+    for sql, count in new:
+        logger.warning("🔁 Likely N+1 in %s %s: statement ran %d times: %s", method, route, count, sql)
+
+
+def record_slow_query():
+    global _slow_queries
+    with _lock:
+        _slow_queries += 1
+
+
+def record_rate_limited(rule: str, key: str):
+    with _lock:
+        _rate_limited[(rule, key)] = _rate_limited.get((rule, key), 0) + 1
+
+
+def register_collector(collect):
+    """Add a function returning exposition lines of another module's metrics"""
+    _collectors.append(collect)
+
+
+@contextmanager
+def serialization_timer():
+    """Count the time spent in the block as serialization time of the current request"""
+    stats = current_request.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serialize_time += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """Request count, in-flight gauge and latency histograms per route template and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        global _in_flight
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if DEV_HEADERS:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-db-queries", str(stats.db_statements).encode()),
+                        (b"x-db-time-ms", f"{stats.db_time * 1000:.2f}".encode()),
+                        (b"x-db-n-plus-one", str(len(stats.repeated_statements())).encode()),
+                    ]
+            await send(message)
+
+        with _lock:
+            _in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            # The router stores the matched route in the scope; use its template
+            # (/api/cars/{car_id}) so label cardinality stays bounded
+            route = scope.get("route")
+            template = route.path if route is not None else "unmatched"
+            record_request(scope["method"], template, status_code, elapsed, stats)
+            with _lock:
+                _in_flight -= 1
+            current_request.reset(token)
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def exposition() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        lines = [
+            "# HELP http_requests_total Total HTTP requests.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), count in sorted(_requests.items()):
+            lines.append(f"http_requests_total{{{_labels(method=method, route=route, status=status)}}} {count}")
+
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being handled.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {_in_flight}",
+            "# HELP http_request_duration_seconds Request latency.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route, status), histogram in sorted(_durations.items()):
+            lines += histogram.exposition(
+                "http_request_duration_seconds", _labels(method=method, route=route, status=status)
+            )
+
+        for name, help_text, store in (
+            ("http_request_db_seconds", "Time spent in database statements per request.", _db_durations),
+            ("http_request_db_statements", "Database statements per request.", _db_statements),
+            ("http_request_serialization_seconds", "Time spent serializing responses per request.", _serialize_durations),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for (method, route), histogram in sorted(store.items()):
+                lines += histogram.exposition(name, _labels(method=method, route=route))
+
+        lines += [
+            "# HELP db_n_plus_one_requests_total Requests that repeated one statement N_PLUS_ONE_THRESHOLD+ times.",
+            "# TYPE db_n_plus_one_requests_total counter",
+        ]
+        for (method, route), count in sorted(_n_plus_one.items()):
+            lines.append(f"db_n_plus_one_requests_total{{{_labels(method=method, route=route)}}} {count}")
+        lines += [
+            "# HELP db_slow_queries_total Statements slower than SQL_SLOW_MS.",
+            "# TYPE db_slow_queries_total counter",
+            f"db_slow_queries_total {_slow_queries}",
+            "# HELP http_rate_limited_total Requests rejected with 429 by the rate limiter.",
+            "# TYPE http_rate_limited_total counter",
+        ]
+        for (rule, key), count in sorted(_rate_limited.items()):
+            lines.append(f"http_rate_limited_total{{{_labels(rule=rule, key=key)}}} {count}")
+
+    for collect in _collectors:
+        lines += collect()
+    return "\n".join(lines) + "\n"
@@ -1,8 +1,11 @@
 # backend/models.py - FIXED User model
-from sqlalchemy import Column, Integer, String, Boolean, Float, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Float, Text, Date, DateTime, ForeignKey, Index, UniqueConstraint, text
 from database import Base
 from sqlalchemy.orm import relationship
 from datetime import datetime
+from log import get_logger
+
+logger = get_logger("models")
 
 class Car(Base):
     """Enhanced Car model with color field"""
@@ -24,6 +27,15 @@ class Car(Base):
     
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Same indexes as postgres-init/01-init.sql; the inventory search
+    # paginates on (column, id) so these keep deep pages cheap
+    __table_args__ = (
+        Index("idx_cars_featured", "featured"),
+        Index("idx_cars_price", "price"),
+        Index("idx_cars_year", "year"),
+        Index("idx_cars_mileage", "mileage"),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -59,7 +71,7 @@ class User(Base):
 
     def to_dict(self):
         """Convert User object to dictionary with proper error handling"""
-        print(f"DEBUG: Converting user to dict - ID: {self.id}, created_at: {self.created_at}")
+        logger.debug("Converting user to dict - ID: %s, created_at: %s", self.id, self.created_at)
         
         result = {
             "id": self.id,
@@ -70,16 +82,14 @@ class User(Base):
             "is_active": self.is_active,
         }
         
-        # Handle created_at with extra debugging
         if self.created_at:
             try:
                 result["created_at"] = self.created_at.isoformat()
-                print(f"DEBUG: created_at converted to ISO: {result['created_at']}")
             except Exception as e:
-                print(f"ERROR: Failed to convert created_at to ISO: {e}")
+                logger.error("Failed to convert created_at to ISO: %s", e)
                 result["created_at"] = str(self.created_at)
         else:
-            print("WARNING: created_at is None!")
+            logger.debug("User %s has no created_at", self.id)
             result["created_at"] = None
         
         return result
@@ -94,6 +104,9 @@ class Favorite(Base):
     car_id = Column(Integer, ForeignKey('cars.id', ondelete='CASCADE'), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    user = relationship("User")
+    car = relationship("Car")
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -112,11 +125,27 @@ class TestDrive(Base):
     car_id = Column(Integer, ForeignKey('cars.id', ondelete='CASCADE'), nullable=False)
     preferred_date = Column(String(100))
     preferred_time = Column(String(100))
+    # Typed slot parsed from preferred_date/preferred_time (dealership local time)
+    slot_start = Column(DateTime, nullable=True)
+    location = Column(String(100), nullable=True)
     phone = Column(String(50))
     message = Column(Text)
     status = Column(String(50), default='pending')
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    user = relationship("User")
+    car = relationship("Car")
+
+    # A car can't be booked twice for the same slot, whichever worker takes the booking
+    __table_args__ = (
+        Index(
+            "uq_test_drives_car_slot", "car_id", "slot_start", unique=True,
+            postgresql_where=text("status IN ('pending', 'approved') AND slot_start IS NOT NULL"),
+            sqlite_where=text("status IN ('pending', 'approved') AND slot_start IS NOT NULL"),
+        ),
+        Index("idx_test_drives_slot", "slot_start"),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -124,6 +153,8 @@ class TestDrive(Base):
             "car_id": self.car_id,
             "preferred_date": self.preferred_date,
             "preferred_time": self.preferred_time,
+            "slot_start": self.slot_start.isoformat() if self.slot_start else None,
+            "location": self.location,
             "phone": self.phone,
             "message": self.message,
             "status": self.status,
@@ -131,6 +162,40 @@ class TestDrive(Base):
         }
 
 
+class TestDriveRollup(Base):
+    """Test drive counts per day/week bucket, car and status (kept up to date on every change)"""
+    __tablename__ = "test_drive_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(String(10), nullable=False)  # 'day' or 'week'
+    bucket = Column(Date, nullable=False)  # the day, or the Monday of the week
+    car_id = Column(Integer, ForeignKey('cars.id', ondelete='CASCADE'), nullable=False)
+    status = Column(String(50), nullable=False)
+    total = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("period", "bucket", "car_id", "status", name="uq_test_drive_rollups_key"),
+    )
+
+    def to_dict(self):
+        return {
+            "period": self.period,
+            "bucket": self.bucket.isoformat() if self.bucket else None,
+            "car_id": self.car_id,
+            "status": self.status,
+            "total": self.total
+        }
+
+
+class TokenRevocation(Base):
+    """Tokens of a user issued up to revoked_before (epoch seconds) are no longer accepted"""
+    __tablename__ = "token_revocations"
+
+    # No foreign key: a deleted user's tokens stay revoked
+    user_id = Column(Integer, primary_key=True)
+    revoked_before = Column(Float, nullable=False)
+
+
 class ContactInquiry(Base):
     """Contact form submissions"""
     __tablename__ = "contact_inquiries"
@@ -0,0 +1,32 @@
+# backend/password_worker.py
+# What the password pool's processes run. Imports nothing from the app (only
+# passlib), so a spawned worker doesn't load FastAPI, SQLAlchemy or the models.
+import os
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+# bcrypt cost; hashes with a different cost are rehashed on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+def hash_password(password: str) -> str:
+    """Hash a password (runs inside the pool)"""
+    return pwd_context.hash(password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password (runs inside the pool).
+    Returns (valid, new_hash); new_hash is set when the stored hash used
+    another bcrypt cost and should be replaced.
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
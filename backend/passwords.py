@@ -0,0 +1,85 @@
+# backend/passwords.py
+# bcrypt hashing/verification on a dedicated, size-capped worker pool.
+# The pool runs the functions of password_worker.py, which imports nothing
+# from the app, so pool processes start quickly.
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from password_worker import BCRYPT_ROUNDS, hash_password, pwd_context, verify_and_update  # noqa: F401
+# "process" (default) or "thread"
+PASSWORD_EXECUTOR = os.getenv("PASSWORD_EXECUTOR", "process")
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Max hash operations queued or running before new ones are rejected with 503
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", str(PASSWORD_WORKERS * 8)))
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+
+
+def get_executor():
+    """The password pool, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if PASSWORD_EXECUTOR == "thread":
+                _executor = ThreadPoolExecutor(
+                    max_workers=PASSWORD_WORKERS, thread_name_prefix="password"
+                )
+            else:
+                # spawn: forking a process that already runs threads is unsafe.
+                # Workers also re-import __main__: under `uvicorn main:app` that is
+                # uvicorn itself, under `python main.py` it is main.py (module level
+                # only, once per worker; startup runs in the lifespan, not there).
+                _executor = ProcessPoolExecutor(
+                    max_workers=PASSWORD_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+        return _executor
+
+
+def shutdown():
+    """Stop the pool (waits for running hashes)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def pending() -> int:
+    return _pending
+
+
+async def _run(func, *args):
+    global _pending
+    with _executor_lock:
+        if _pending >= PASSWORD_MAX_PENDING:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), func, *args)
+    finally:
+        with _executor_lock:
+            _pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the pool without blocking the event loop"""
+    return await _run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """verify_and_update() on the pool without blocking the event loop"""
+    return await _run(verify_and_update, plain_password, hashed_password)
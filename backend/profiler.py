@@ -0,0 +1,239 @@
+# backend/profiler.py
+# On-demand statistical profiler: a sampling thread walks sys._current_frames()
+# and aggregates collapsed stacks (flamegraph.pl / speedscope input).
+# When no profile is running the middleware only checks for the X-Profile header.
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from starlette.routing import Match
+
+import auth
+
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+# Finished profiles kept for download
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+
+# A thread whose innermost frame is in one of these files is waiting, not working
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_session = None  # running ProfileSession, if any
+_results = OrderedDict()  # id -> finished ProfileSession
+_labels = {}  # code object -> frame label
+
+
+class ProfileSession:
+    """
+    One profiling run. Either a time window (every thread is sampled) or the
+    next `requests` requests matching `route` (threads are sampled while such
+    a request is in flight).
+    """
+
+    def __init__(self, seconds: float, route: Optional[str] = None,
+                 requests: Optional[int] = None, explicit: bool = False):
+        self.id = next(_ids)
+        self.route = route
+        self.requests = requests
+        self.remaining = requests
+        # Only requests that opted in with X-Profile are profiled
+        self.explicit = explicit
+        self.active = 0
+        self.samples = 0
+        self.stacks = Counter()
+        self.started_at = time.time()
+        self.deadline = time.monotonic() + min(seconds, PROFILE_MAX_SECONDS)
+        self.finished_at = None
+        self.stop_event = threading.Event()
+
+    @property
+    def by_request(self) -> bool:
+        return self.requests is not None
+
+    def claim(self) -> bool:
+        """Reserve one of the remaining requests"""
+        with _lock:
+            if self.finished_at is not None or not self.remaining:
+                return False
+            self.remaining -= 1
+            self.active += 1
+            return True
+
+    def release(self):
+        with _lock:
+            self.active -= 1
+            done = self.remaining == 0 and self.active == 0
+        if done:
+            self.stop_event.set()
+
+    def info(self) -> dict:
+        return {
+            "id": self.id,
+            "status": "done" if self.finished_at is not None else "running",
+            "route": self.route,
+            "requests": self.requests,
+            "profiled_requests": (self.requests - self.remaining - self.active) if self.by_request else None,
+            "samples": self.samples,
+            "interval_ms": PROFILE_INTERVAL * 1000,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, one "frame;frame;frame count" line per stack"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label
+
+
+def _sample(session: ProfileSession, own_id: int):
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    for thread_id, frame in sys._current_frames().items():
+        if thread_id == own_id or os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+            continue
+        stack = []
+        while frame is not None:
+            stack.append(_label(frame.f_code))
+            frame = frame.f_back
+        stack.append(names.get(thread_id, str(thread_id)))
+        session.stacks[";".join(reversed(stack))] += 1
+    session.samples += 1
+
+
+def _run(session: ProfileSession):
+    global _session
+    own_id = threading.get_ident()
+    while not session.stop_event.is_set() and time.monotonic() < session.deadline:
+        if not session.by_request or session.active:
+            _sample(session, own_id)
+        session.stop_event.wait(PROFILE_INTERVAL)
+
+    with _lock:
+        session.finished_at = time.time()
+        _session = None
+        _results[session.id] = session
+        while len(_results) > PROFILE_KEEP:
+            _results.popitem(last=False)
+
+
+def start(seconds: float, route: Optional[str] = None, requests: Optional[int] = None,
+          explicit: bool = False) -> Optional[ProfileSession]:
+    """Start a profile; returns None when one is already running"""
+    global _session
+    with _lock:
+        if _session is not None:
+            return None
+        session = _session = ProfileSession(seconds, route, requests, explicit)
+    threading.Thread(target=_run, args=(session,), name="profiler", daemon=True).start()
+    return session
+
+
+def stop():
+    session = _session
+    if session is not None:
+        session.stop_event.set()
+
+
+def current() -> Optional[ProfileSession]:
+    return _session
+
+
+def get(profile_id: int) -> Optional[ProfileSession]:
+    with _lock:
+        session = _results.get(profile_id)
+    if session is None and _session is not None and _session.id == profile_id:
+        return _session
+    return session
+
+
+def list_profiles() -> list:
+    with _lock:
+        sessions = list(_results.values())
+    if _session is not None:
+        sessions.append(_session)
+    return [session.info() for session in sessions]
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+def _is_admin(scope) -> bool:
+    authorization = _header(scope, b"authorization")
+    if not authorization or not authorization.lower().startswith(b"bearer "):
+        return False
+    principal = auth.decode_principal(authorization[7:].decode("latin-1"))
+    return principal is not None and principal.is_active and principal.role == "admin"
+
+
+def _route_template(app, scope) -> Optional[str]:
+    for route in app.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return None
+
+
+class ProfilerMiddleware:
+    """Ties request-scoped profiles to the requests they target"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        session = _session
+        opted_in = _header(scope, b"x-profile") is not None
+        if session is None and not opted_in:
+            await self.app(scope, receive, send)
+            return
+
+        if opted_in and _is_admin(scope):
+            # One-off profile of this request only
+            session = start(PROFILE_MAX_SECONDS, requests=1, explicit=True)
+            await self._profile(session, scope, receive, send, "busy")
+            return
+
+        if (session is not None and session.by_request and not session.explicit
+                and (session.route is None or _route_template(scope["app"], scope) == session.route)):
+            await self._profile(session, scope, receive, send, None)
+            return
+
+        await self.app(scope, receive, send)
+
+    async def _profile(self, session, scope, receive, send, busy_header):
+        claimed = session is not None and session.claim()
+        if not claimed and busy_header is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                value = str(session.id) if claimed else busy_header
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", value.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if claimed:
+                session.release()
@@ -0,0 +1,227 @@
+# backend/ratelimit.py
+# Token-bucket rate limiting for the unauthenticated endpoints (login,
+# register, contact), keyed by client IP and by the account being targeted.
+# Runs as ASGI middleware, so rejected requests never reach a handler, the
+# database or bcrypt.
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import unquote_plus
+
+import metrics
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+# Keys tracked per limit; the least recently used ones are dropped beyond this
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Take the client IP from X-Forwarded-For (only behind a proxy that sets it)
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0") == "1"
+# Proxies of ours in front of the app, each appending to X-Forwarded-For: the
+# client is this many entries from the right (the ones left of it are the
+# client's own and can be forged)
+RATE_LIMIT_TRUSTED_HOPS = max(1, int(os.getenv("RATE_LIMIT_TRUSTED_HOPS", "1")))
+# Bodies larger than this are not parsed for the account key
+MAX_BODY_BYTES = 64 * 1024
+
+
+def parse_rate(value: str) -> tuple:
+    """'5/60' -> (5 requests, per 60 seconds)"""
+    requests, seconds = value.split("/")
+    return int(requests), float(seconds)
+
+
+class TokenBucketLimiter:
+    """
+    One token bucket per key: `burst` tokens, refilled at burst/period per
+    second. Buckets live in an OrderedDict in last-use order; a bucket idle
+    long enough to be full again is the same as no bucket, so those are
+    dropped from the old end on every call, and the size is capped at
+    max_keys either way.
+    """
+
+    def __init__(self, burst: int, period: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.burst = burst
+        self.rate = burst / period
+        self.idle = period  # an idle bucket is full again after this long
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, last update]
+        self._lock = threading.Lock()
+
+    def hit(self, key, now: Optional[float] = None) -> float:
+        """Take a token; 0 if allowed, else the seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        buckets = self._buckets
+        with self._lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [float(self.burst), now]
+            else:
+                buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            # Expire idle buckets (oldest first) and cap the size
+            expired = now - self.idle
+            while buckets:
+                oldest_key, oldest = next(iter(buckets.items()))
+                if oldest[1] > expired and len(buckets) <= self.max_keys:
+                    break
+                if oldest_key == key:
+                    break
+                buckets.popitem(last=False)
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class Rule:
+    """Limits of one route: per client IP and, optionally, per target account"""
+
+    def __init__(self, name: str, ip: str, account: Optional[str] = None,
+                 account_field: Optional[str] = None):
+        self.name = name
+        self.ip = TokenBucketLimiter(*parse_rate(ip))
+        self.account = TokenBucketLimiter(*parse_rate(account)) if account else None
+        self.account_field = account_field
+
+
+def _rule(name: str, default_ip: str, default_account: Optional[str] = None, account_field: Optional[str] = None):
+    env = name.upper()
+    return Rule(
+        name,
+        os.getenv(f"RATE_LIMIT_{env}_IP", default_ip),
+        os.getenv(f"RATE_LIMIT_{env}_ACCOUNT", default_account) if default_account else None,
+        account_field,
+    )
+
+
+# (method, path) -> Rule. Rates are "requests/seconds", overridable per route
+# with RATE_LIMIT_<NAME>_IP / RATE_LIMIT_<NAME>_ACCOUNT
+RULES = {
+    ("POST", "/api/auth/login"): _rule("login", "20/60", "5/60", account_field="username"),
+    ("POST", "/api/auth/register"): _rule("register", "10/3600", "3/3600", account_field="email"),
+    ("POST", "/api/contact"): _rule("contact", "5/600"),
+}
+
+
+def client_ip(scope) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = [
+            entry.strip()
+            for name, value in scope.get("headers", ())
+            if name == b"x-forwarded-for"
+            for entry in value.split(b",")
+            if entry.strip()
+        ]
+        if forwarded:
+            return forwarded[-min(RATE_LIMIT_TRUSTED_HOPS, len(forwarded))].decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def account_key(scope, body: bytes, field: str) -> Optional[str]:
+    """The targeted account from a form or JSON body (normalized), if any"""
+    content_type = b""
+    for name, value in scope.get("headers", ()):
+        if name == b"content-type":
+            content_type = value.split(b";")[0].strip().lower()
+            break
+    try:
+        if content_type == b"application/x-www-form-urlencoded":
+            prefix = field.encode() + b"="
+            value = next(
+                (unquote_plus(part[len(prefix):].decode("utf-8")) for part in body.split(b"&") if part.startswith(prefix)),
+                None,
+            )
+        elif content_type == b"application/json":
+            data = json.loads(body)
+            value = data.get(field) if isinstance(data, dict) else None
+        else:
+            return None
+    except ValueError:
+        return None
+    if not isinstance(value, str) or not value.strip():
+        return None
+    return value.strip().casefold()
+
+
+async def _reject(send, retry_after: float):
+    seconds = max(1, int(retry_after + 0.999))
+    body = json.dumps({"detail": f"Too many requests. Try again in {seconds} seconds."}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(seconds).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """Applies RULES before the request reaches the router"""
+
+    def __init__(self, app, rules: dict = None):
+        self.app = app
+        self.rules = RULES if rules is None else rules
+
+    async def __call__(self, scope, receive, send):
+        if not RATE_LIMIT_ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rule = self.rules.get((scope["method"], scope["path"]))
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = rule.ip.hit(client_ip(scope))
+        if retry_after:
+            metrics.record_rate_limited(rule.name, "ip")
+            await _reject(send, retry_after)
+            return
+        if rule.account is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Read the body to find the account, then hand the same body to the app
+        chunks = []
+        size = 0
+        more = True
+        while more:
+            message = await receive()
+            if message["type"] != "http.request":
+                return  # client went away
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            more = message.get("more_body", False)
+            if size > MAX_BODY_BYTES:
+                break
+        body = b"".join(chunks)
+
+        account = account_key(scope, body, rule.account_field) if not more else None
+        if account is not None:
+            retry_after = rule.account.hit(account)
+            if retry_after:
+                metrics.record_rate_limited(rule.name, "account")
+                await _reject(send, retry_after)
+                return
+
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": more}
+            return await receive()
+
+        await self.app(scope, replay, send)
@@ -0,0 +1,76 @@
+# backend/readmodels.py
+# Read-only list path: select only the columns a response needs, map the row
+# tuples into slotted dataclasses and encode them straight to JSON bytes.
+# No ORM identity map, no to_dict() and no response_model re-validation.
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import select
+
+import models
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used instead
+    orjson = None
+
+
+@dataclass
+class CarSpecsRow:
+    __slots__ = ("engine", "transmission", "fuel")
+    engine: Optional[str]
+    transmission: Optional[str]
+    fuel: Optional[str]
+
+
+@dataclass
+class CarRow:
+    """A car as returned by the list endpoints (same fields/order as CarResponse)"""
+    __slots__ = ("id", "name", "price", "year", "mileage", "image", "featured",
+                 "description", "specs", "color")
+    id: int
+    name: str
+    price: int
+    year: int
+    mileage: int
+    image: Optional[str]
+    featured: bool
+    description: Optional[str]
+    specs: CarSpecsRow
+    color: Optional[str]
+
+
+Car = models.Car
+CAR_COLUMNS = (
+    Car.id, Car.name, Car.price, Car.year, Car.mileage, Car.image, Car.featured,
+    Car.description, Car.engine, Car.transmission, Car.fuel, Car.color,
+)
+
+
+def car_select():
+    """select() of the CarRow columns; filters, sorting and cursors apply as usual"""
+    return select(*CAR_COLUMNS)
+
+
+def car_rows(rows) -> list:
+    """Result rows of car_select() -> CarRow list"""
+    return [
+        CarRow(id, name, price, year, mileage, image, bool(featured), description,
+               CarSpecsRow(engine, transmission, fuel), color)
+        for (id, name, price, year, mileage, image, featured, description,
+             engine, transmission, fuel, color) in rows
+    ]
+
+
+def _default(value):
+    if hasattr(value, "__slots__"):
+        return {name: getattr(value, name) for name in value.__slots__}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data) -> bytes:
+    """JSON bytes for read models (and lists/dicts of them)"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=_default, separators=(",", ":")).encode()
@@ -0,0 +1,117 @@
+# backend/rollups.py
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+import models
+
+PERIODS = ("day", "week")
+STATUSES = ["pending", "approved", "completed", "cancelled"]
+
+
+def bucket_start(period: str, when) -> date:
+    """First day of the bucket a date/datetime falls into (weeks start on Monday)"""
+    day = when.date() if isinstance(when, datetime) else when
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def _upsert(db, period: str, bucket: date, car_id: int, status: str, delta: int):
+    """Add `delta` to one rollup row, creating it if needed, in a single statement"""
+    Rollup = models.TestDriveRollup
+    values = dict(period=period, bucket=bucket, car_id=car_id, status=status, total=delta)
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(Rollup).values(**values).on_conflict_do_update(
+            index_elements=["period", "bucket", "car_id", "status"],
+            set_={"total": Rollup.total + delta}
+        )
+        db.execute(stmt)
+        return
+
+    row = db.query(Rollup).filter_by(
+        period=period, bucket=bucket, car_id=car_id, status=status
+    ).with_for_update().first()
+    if row:
+        row.total += delta
+    else:
+        db.add(Rollup(**values))
+
+
+def record(db, test_drive: models.TestDrive, delta: int, status: Optional[str] = None):
+    """
+    Count (delta=1) or uncount (delta=-1) a test drive in its day and week
+    buckets. Runs in the caller's transaction, so rollups commit together
+    with the change to test_drives.
+    """
+    created_at = test_drive.created_at or datetime.utcnow()
+    for period in PERIODS:
+        _upsert(
+            db, period, bucket_start(period, created_at),
+            test_drive.car_id, status or test_drive.status, delta
+        )
+
+
+def get_rollups(
+    db,
+    period: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    car_id: Optional[int] = None,
+    by_car: bool = False
+) -> list:
+    """Counts per bucket (and per car if by_car), one dict of status counts each"""
+    Rollup = models.TestDriveRollup
+    columns = [Rollup.bucket, Rollup.status]
+    if by_car:
+        columns.insert(1, Rollup.car_id)
+
+    query = db.query(*columns, func.sum(Rollup.total)).filter(Rollup.period == period)
+    if start:
+        query = query.filter(Rollup.bucket >= bucket_start(period, start))
+    if end:
+        query = query.filter(Rollup.bucket <= end)
+    if car_id is not None:
+        query = query.filter(Rollup.car_id == car_id)
+    # Rows drained back to zero by status changes/deletes are left in place
+    rows = query.group_by(*columns).having(func.sum(Rollup.total) != 0).order_by(*columns).all()
+
+    buckets = {}
+    for row in rows:
+        key = tuple(row[:-2])
+        total = int(row[-1] or 0)
+        if key not in buckets:
+            entry = {"bucket": key[0].isoformat()}
+            if by_car:
+                entry["car_id"] = key[1]
+            entry.update({"total": 0, "counts": {status: 0 for status in STATUSES}})
+            buckets[key] = entry
+        buckets[key]["counts"][row[-2]] = total
+        buckets[key]["total"] += total
+
+    return list(buckets.values())
+
+
+def rebuild(db) -> int:
+    """Recompute every rollup row from test_drives (backfill / repair)"""
+    TestDrive = models.TestDrive
+    totals = defaultdict(int)
+    rows = db.query(TestDrive.car_id, TestDrive.status, TestDrive.created_at).yield_per(1000)
+    for car_id, status, created_at in rows:
+        created_at = created_at or datetime.utcnow()
+        for period in PERIODS:
+            totals[(period, bucket_start(period, created_at), car_id, status or "pending")] += 1
+
+    db.query(models.TestDriveRollup).delete()
+    db.add_all([
+        models.TestDriveRollup(period=period, bucket=bucket, car_id=car_id, status=status, total=total)
+        for (period, bucket, car_id, status), total in totals.items()
+    ])
+    db.commit()
+    return len(totals)
@@ -0,0 +1,331 @@
+# backend/scheduler.py
+# Test drive slots: typed slot times, per-car and per-location capacity and an
+# in-memory index of the active bookings, so conflict checks and availability
+# don't scan test_drives.
+import os
+import re
+import threading
+import uuid
+import zlib
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, inspect, select, text, update
+from sqlalchemy.orm import Session
+
+import models
+from log import get_logger
+
+logger = get_logger("scheduler")
+
+SLOT_MINUTES = int(os.getenv("TEST_DRIVE_SLOT_MINUTES", "60"))
+# Slot start times offered every open day (same as the booking form)
+SLOT_TIMES = [
+    time.fromisoformat(value.strip())
+    for value in os.getenv("TEST_DRIVE_SLOT_TIMES", "09:00,10:00,11:00,13:00,14:00,15:00,16:00").split(",")
+]
+# Open weekdays, Monday = 0
+OPEN_WEEKDAYS = {int(day) for day in os.getenv("TEST_DRIVE_WEEKDAYS", "0,1,2,3,4,5").split(",")}
+LOCATIONS = [name.strip() for name in os.getenv("TEST_DRIVE_LOCATIONS", "Main Showroom").split(",")]
+# Test drives a location can run at the same time (staff, parking)
+LOCATION_CAPACITY = int(os.getenv("TEST_DRIVE_LOCATION_CAPACITY", "3"))
+# How far ahead a slot can be booked
+BOOKING_HORIZON_DAYS = int(os.getenv("TEST_DRIVE_HORIZON_DAYS", "90"))
+AVAILABILITY_MAX_DAYS = 14
+ACTIVE_STATUSES = ("pending", "approved")
+
+_EPOCH = datetime(2000, 1, 1)
+_time_pattern = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*([AaPp][Mm])?\s*$")
+
+
+def parse_time(value: Optional[str]) -> Optional[time]:
+    """'9:00 AM', '9 am', '09:00' or '13:30' -> time (None if not a time)"""
+    match = _time_pattern.match(value or "")
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.lower() == "pm" else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return time(hour, minute)
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    """YYYY-MM-DD -> date (None if not a date)"""
+    try:
+        return date.fromisoformat((value or "").strip())
+    except ValueError:
+        return None
+
+
+def format_time(value: time) -> str:
+    """time -> '9:00 AM', the booking form's format"""
+    return f"{value.hour % 12 or 12}:{value.minute:02d} {'AM' if value.hour < 12 else 'PM'}"
+
+
+def resolve_location(location: Optional[str]) -> str:
+    if not location:
+        return LOCATIONS[0]
+    if location not in LOCATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid location. Must be one of: {', '.join(LOCATIONS)}"
+        )
+    return location
+
+
+def slots_of_day(day: date) -> List[datetime]:
+    if day.weekday() not in OPEN_WEEKDAYS:
+        return []
+    return [datetime.combine(day, slot) for slot in SLOT_TIMES]
+
+
+def slot_start(preferred_date: str, preferred_time: str, now: Optional[datetime] = None) -> datetime:
+    """The bookable slot a request asks for, or HTTPException(400) saying why not"""
+    day = parse_date(preferred_date)
+    if day is None:
+        raise HTTPException(status_code=400, detail="Invalid date. Use YYYY-MM-DD")
+    slot = parse_time(preferred_time)
+    if slot is None:
+        raise HTTPException(status_code=400, detail="Invalid time. Use e.g. 9:00 AM or 13:00")
+    if slot not in SLOT_TIMES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid time. Must be one of: {', '.join(format_time(t) for t in SLOT_TIMES)}"
+        )
+    if day.weekday() not in OPEN_WEEKDAYS:
+        raise HTTPException(status_code=400, detail="We are closed on that day")
+    start = datetime.combine(day, slot)
+    now = now or datetime.now()
+    if start <= now:
+        raise HTTPException(status_code=400, detail="That time slot is in the past")
+    if day > now.date() + timedelta(days=BOOKING_HORIZON_DAYS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Test drives can be booked up to {BOOKING_HORIZON_DAYS} days ahead"
+        )
+    return start
+
+
+def _minute(start: datetime) -> int:
+    return int((start - _EPOCH).total_seconds()) // 60
+
+
+class SlotIndex:
+    """
+    Sorted slot starts (minutes) of the active bookings, per car and per
+    location. A slot is taken when a booking starts less than SLOT_MINUTES
+    before or after it, i.e. a bisect range of the sorted list, so checks
+    are O(log n) in the bookings of that car or location.
+
+    Per process and reloaded when the test_drives version moves (see
+    catalogversion), so it is a fast first check; across workers the partial
+    unique index uq_test_drives_car_slot keeps a car from being booked twice
+    and check_location_capacity() enforces LOCATION_CAPACITY in the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bookings = {}  # booking key -> (car id, location, minute)
+        self._cars = {}  # car id -> sorted minutes
+        self._locations = {}  # location -> sorted minutes
+        self.loaded = False
+
+    @staticmethod
+    def _overlapping(starts: list, minute: int) -> int:
+        return bisect_left(starts, minute + SLOT_MINUTES) - bisect_right(starts, minute - SLOT_MINUTES)
+
+    def _conflict(self, car_id: int, location: str, minute: int) -> Optional[str]:
+        if self._overlapping(self._cars.get(car_id, ()), minute):
+            return "This car is already booked for that time slot"
+        if self._overlapping(self._locations.get(location, ()), minute) >= LOCATION_CAPACITY:
+            return f"{location} is fully booked for that time slot"
+        return None
+
+    def _add(self, key, car_id: int, location: str, minute: int):
+        self._bookings[key] = (car_id, location, minute)
+        insort(self._cars.setdefault(car_id, []), minute)
+        insort(self._locations.setdefault(location, []), minute)
+
+    def _remove(self, key):
+        entry = self._bookings.pop(key, None)
+        if entry is None:
+            return
+        car_id, location, minute = entry
+        for starts, owner, index in ((self._cars.get(car_id), car_id, self._cars),
+                                     (self._locations.get(location), location, self._locations)):
+            position = bisect_left(starts, minute)
+            del starts[position]
+            if not starts:
+                del index[owner]
+
+    # ----- bookings -----
+
+    def hold(self, car_id: int, location: str, start: datetime):
+        """
+        Reserve a slot before the booking is written; raises HTTPException(409)
+        if it is taken. Returns a key for confirm() or release().
+        """
+        minute = _minute(start)
+        with self._lock:
+            reason = self._conflict(car_id, location, minute)
+            if reason:
+                raise HTTPException(status_code=409, detail=reason)
+            key = ("hold", uuid.uuid4().hex)
+            self._add(key, car_id, location, minute)
+            return key
+
+    def confirm(self, key, test_drive_id: int):
+        """The held booking was committed as test drive `test_drive_id`"""
+        with self._lock:
+            entry = self._bookings.pop(key, None)
+            if entry is not None:
+                self._bookings[test_drive_id] = entry
+
+    def release(self, key):
+        """A held or active booking no longer takes its slot"""
+        with self._lock:
+            self._remove(key)
+
+    def release_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    # ----- queries -----
+
+    def availability(self, car_id: int, location: str, first_day: date, days: int,
+                     now: Optional[datetime] = None) -> List[dict]:
+        """Every slot of `days` days from first_day with whether it can be booked"""
+        now = now or datetime.now()
+        result = []
+        with self._lock:
+            for offset in range(days):
+                day = first_day + timedelta(days=offset)
+                result.append({
+                    "date": day.isoformat(),
+                    "slots": [
+                        {
+                            "time": format_time(start.time()),
+                            "start": start.isoformat(),
+                            "available": start > now and self._conflict(car_id, location, _minute(start)) is None,
+                        }
+                        for start in slots_of_day(day)
+                    ],
+                })
+        return result
+
+    def next_free(self, car_id: int, location: str, after: datetime, count: int) -> List[datetime]:
+        """The first `count` bookable slots after `after` (within the booking horizon)"""
+        found = []
+        last_day = after.date() + timedelta(days=BOOKING_HORIZON_DAYS)
+        day = after.date()
+        with self._lock:
+            while day <= last_day and len(found) < count:
+                for start in slots_of_day(day):
+                    if start > after and self._conflict(car_id, location, _minute(start)) is None:
+                        found.append(start)
+                        if len(found) == count:
+                            break
+                day += timedelta(days=1)
+        return found
+
+    # ----- loading -----
+
+    def load(self, bind):
+        """(Re)build from the active, not yet past bookings, keeping the holds in flight"""
+        TestDrive = models.TestDrive
+        since = datetime.combine(date.today(), time()) - timedelta(minutes=SLOT_MINUTES)
+        with Session(bind) as db:
+            rows = db.execute(
+                select(TestDrive.id, TestDrive.car_id, TestDrive.location, TestDrive.slot_start).where(
+                    TestDrive.status.in_(ACTIVE_STATUSES),
+                    TestDrive.slot_start >= since,
+                )
+            ).all()
+        with self._lock:
+            holds = {key: entry for key, entry in self._bookings.items() if isinstance(key, tuple)}
+            self._bookings, self._cars, self._locations = {}, {}, {}
+            for test_drive_id, car_id, location, start in rows:
+                self._add(test_drive_id, car_id, location or LOCATIONS[0], _minute(start))
+            for key, entry in holds.items():
+                self._add(key, *entry)
+            self.loaded = True
+        logger.info("📅 Test drive slots loaded: %d active bookings", len(rows))
+
+
+def check_location_capacity(db: Session, location: str, start: datetime):
+    """
+    Call after flushing a booking that takes `start` at `location`: raises
+    HTTPException(409) if that makes more active drives there than
+    LOCATION_CAPACITY. On PostgreSQL a transaction-scoped advisory lock per
+    location makes bookings there count one after the other (each sees the
+    ones committed before it); on SQLite the flushed insert already holds
+    the write lock.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        key = zlib.crc32(f"test_drives:{location}".encode())
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": key})
+    TestDrive = models.TestDrive
+    active = db.scalar(
+        select(func.count()).select_from(TestDrive).where(
+            func.coalesce(TestDrive.location, LOCATIONS[0]) == location,
+            TestDrive.status.in_(ACTIVE_STATUSES),
+            TestDrive.slot_start > start - timedelta(minutes=SLOT_MINUTES),
+            TestDrive.slot_start < start + timedelta(minutes=SLOT_MINUTES),
+        )
+    )
+    if active > LOCATION_CAPACITY:
+        raise HTTPException(status_code=409, detail=f"{location} is fully booked for that time slot")
+
+
+def install(engine):
+    """
+    Add slot_start/location to an existing test_drives table, fill slot_start
+    from the old free-form date/time where it parses (first booking of a
+    car/slot wins), then create the slot indexes. Idempotent.
+    """
+    TestDrive = models.TestDrive
+    columns = {column["name"] for column in inspect(engine).get_columns("test_drives")}
+    with engine.begin() as conn:
+        if "slot_start" not in columns:
+            conn.execute(text("ALTER TABLE test_drives ADD COLUMN slot_start TIMESTAMP"))
+        if "location" not in columns:
+            conn.execute(text("ALTER TABLE test_drives ADD COLUMN location VARCHAR(100)"))
+
+        pending = conn.execute(
+            select(TestDrive.id, TestDrive.car_id, TestDrive.status,
+                   TestDrive.preferred_date, TestDrive.preferred_time)
+            .where(TestDrive.slot_start.is_(None)).order_by(TestDrive.id)
+        ).all()
+        filled = 0
+        if pending:
+            taken = set(conn.execute(
+                select(TestDrive.car_id, TestDrive.slot_start).where(
+                    TestDrive.slot_start.is_not(None), TestDrive.status.in_(ACTIVE_STATUSES)
+                )
+            ).all())
+            for row in pending:
+                day, slot = parse_date(row.preferred_date), parse_time(row.preferred_time)
+                if day is None or slot is None:
+                    continue
+                start = datetime.combine(day, slot)
+                if row.status in ACTIVE_STATUSES:
+                    if (row.car_id, start) in taken:
+                        continue  # a double booking from before: left for the owner to sort out
+                    taken.add((row.car_id, start))
+                conn.execute(update(TestDrive).where(TestDrive.id == row.id).values(slot_start=start))
+                filled += 1
+        if filled:
+            logger.info("📅 Filled slot_start for %d existing test drives", filled)
+
+        for index in TestDrive.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+
+index = SlotIndex()
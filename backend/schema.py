@@ -0,0 +1,81 @@
+# backend/schema.py
+# Schema setup at startup, skipped when nothing changed: a hash of the DDL the
+# models (and the install steps) would produce is stored in the database, and
+# create_all/install only run when it differs.
+import hashlib
+import os
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+import catalogversion
+import fulltext
+import scheduler
+from database import Base
+from log import get_logger
+
+logger = get_logger("schema")
+
+# 0 = run create_all and the install steps on every start
+SCHEMA_FINGERPRINT = os.getenv("SCHEMA_FINGERPRINT", "1") == "1"
+# Bump when an install step (scheduler.install, fulltext.install,
+# catalogversion.install) changes without changing the models' DDL
+SCHEMA_REVISION = "1"
+
+fingerprints = Table(
+    "schema_fingerprint",
+    MetaData(),
+    Column("name", String(50), primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def fingerprint(engine) -> str:
+    """SHA-256 of the CREATE TABLE / CREATE INDEX statements for this dialect"""
+    dialect = engine.dialect
+    digest = hashlib.sha256(f"revision {SCHEMA_REVISION}\n".encode())
+    for name in sorted(Base.metadata.tables):
+        table = Base.metadata.tables[name]
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    for ddl in fulltext.POSTGRES_DDL if dialect.name == "postgresql" else fulltext.SQLITE_DDL:
+        digest.update(ddl.encode())
+    for ddl in catalogversion.ddl(dialect.name):
+        digest.update(ddl.encode())
+    return digest.hexdigest()
+
+
+def stored_fingerprint(engine) -> Optional[str]:
+    try:
+        with engine.connect() as conn:
+            return conn.scalar(select(fingerprints.c.fingerprint).where(fingerprints.c.name == "models"))
+    except DBAPIError:
+        return None  # no fingerprint table yet
+
+
+def ensure(engine) -> bool:
+    """Create missing tables and run the install steps if the models changed; True if it ran"""
+    current = fingerprint(engine)
+    if SCHEMA_FINGERPRINT and stored_fingerprint(engine) == current:
+        fulltext.use(engine)
+        logger.info("✅ Database schema up to date (%s)", current[:12])
+        return False
+
+    logger.info("Creating database tables...")
+    Base.metadata.create_all(bind=engine)
+    scheduler.install(engine)
+    fulltext.install(engine)
+    catalogversion.install(engine)
+    with engine.begin() as conn:
+        fingerprints.create(conn, checkfirst=True)
+        conn.execute(fingerprints.delete().where(fingerprints.c.name == "models"))
+        conn.execute(fingerprints.insert().values(
+            name="models", fingerprint=current, applied_at=datetime.utcnow()
+        ))
+    logger.info("Database tables created successfully! (%s)", current[:12])
+    return True
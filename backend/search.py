@@ -0,0 +1,222 @@
+# backend/search.py
+import base64
+import json
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import and_, func, not_, or_, tuple_
+
+import models
+
+# Same brand list the inventory page uses to derive a brand from Car.name.
+# Order matters: a car belongs to the FIRST brand its name contains.
+BRANDS = [
+    "Mercedes-Benz", "BMW", "Audi", "Porsche", "Tesla", "Range Rover",
+    "Lamborghini", "Ferrari", "McLaren", "Bentley", "Lexus", "Jaguar",
+    "Maserati", "Aston Martin", "Volkswagen", "Seat", "Renault", "Peugeot",
+    "Ford", "Skoda", "KIA", "Dacia", "Toyota", "Honda", "Nissan", "Mazda",
+    "Chevrolet", "Dodge", "Jeep",
+]
+OTHER_BRAND = "Other"
+
+# Lower-cased fragments of Car.engine for each engine size bucket
+ENGINE_SIZES = {
+    "small": ["1.", "2.0", "2.2"],
+    "medium": ["2.5", "3.", "4."],
+    "large": ["5.", "6.", "v8", "v10", "v12", "w12"],
+}
+
+# sort option -> (Car column name or None for id only, descending?)
+SORT_OPTIONS = {
+    "newest": (None, True),
+    "price-low": ("price", False),
+    "price-high": ("price", True),
+    "year-new": ("year", True),
+    "year-old": ("year", False),
+    "mileage-low": ("mileage", False),
+    "mileage-high": ("mileage", True),
+}
+DEFAULT_SORT = "newest"
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+def extract_brand(name: Optional[str]) -> str:
+    """Derive the brand of a car from its name (mirrors the inventory page)"""
+    if name:
+        for brand in BRANDS:
+            if brand in name:
+                return brand
+    return OTHER_BRAND
+
+
+class CarFilters(BaseModel):
+    """Inventory filters accepted as query parameters ("all" means no filter)"""
+    brand: Optional[str] = None
+    price_min: Optional[int] = None
+    price_max: Optional[int] = None
+    year_min: Optional[int] = None
+    year_max: Optional[int] = None
+    mileage_max: Optional[int] = None
+    fuel: Optional[str] = None
+    transmission: Optional[str] = None
+    engine_size: Optional[str] = None
+    color: Optional[str] = None
+
+    def active(self) -> dict:
+        """Only the filters that actually restrict the result"""
+        return {
+            key: value
+            for key, value in self.model_dump().items()
+            if value is not None and value != "" and value != "all"
+        }
+
+    def cache_key(self) -> tuple:
+        """Hashable, order-independent key for this filter set"""
+        return tuple(sorted(self.active().items()))
+
+
+def brand_condition(brand: str):
+    """SQL condition equivalent to extract_brand(Car.name) == brand"""
+    name = models.Car.name
+    if brand == OTHER_BRAND:
+        return and_(*[not_(name.contains(b)) for b in BRANDS])
+    if brand not in BRANDS:
+        return name.contains(brand)
+    earlier = BRANDS[:BRANDS.index(brand)]
+    return and_(name.contains(brand), *[not_(name.contains(b)) for b in earlier])
+
+
+def engine_size_condition(size: str):
+    """SQL condition for an engine size bucket"""
+    fragments = ENGINE_SIZES.get(size)
+    if fragments is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid engine_size. Must be one of: {', '.join(ENGINE_SIZES)}"
+        )
+    engine = func.lower(models.Car.engine)
+    return or_(*[engine.contains(fragment) for fragment in fragments])
+
+
+def filter_conditions(filters: CarFilters) -> list:
+    """Translate a CarFilters into a list of SQL conditions on models.Car"""
+    active = filters.active()
+    Car = models.Car
+    conditions = []
+
+    if "brand" in active:
+        conditions.append(brand_condition(active["brand"]))
+    if "engine_size" in active:
+        conditions.append(engine_size_condition(active["engine_size"]))
+    if "color" in active:
+        conditions.append(Car.color == active["color"])
+    if "price_min" in active:
+        conditions.append(Car.price >= active["price_min"])
+    if "price_max" in active:
+        conditions.append(Car.price <= active["price_max"])
+    if "year_min" in active:
+        conditions.append(Car.year >= active["year_min"])
+    if "year_max" in active:
+        conditions.append(Car.year <= active["year_max"])
+    if "mileage_max" in active:
+        conditions.append(Car.mileage <= active["mileage_max"])
+    if "fuel" in active:
+        conditions.append(Car.fuel == active["fuel"])
+    if "transmission" in active:
+        conditions.append(Car.transmission == active["transmission"])
+
+    return conditions
+
+
+def apply_filters(stmt, filters: CarFilters):
+    """Apply the inventory filters to a Car select"""
+    conditions = filter_conditions(filters)
+    if conditions:
+        stmt = stmt.where(*conditions)
+    return stmt
+
+
+def _sort_option(sort: str):
+    if sort not in SORT_OPTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid sort. Must be one of: {', '.join(SORT_OPTIONS)}"
+        )
+    return SORT_OPTIONS[sort]
+
+
+def apply_sort(stmt, sort: str):
+    """Order a Car select by a sort option, with id as the tie breaker"""
+    column_name, descending = _sort_option(sort)
+    columns = [models.Car.id]
+    if column_name:
+        columns.insert(0, getattr(models.Car, column_name))
+    if descending:
+        columns = [column.desc() for column in columns]
+    return stmt.order_by(*columns)
+
+
+def encode_cursor(sort: str, car) -> str:
+    """Opaque cursor pointing just after `car` in the given sort order"""
+    column_name, _ = _sort_option(sort)
+    key = [sort, car.id]
+    if column_name:
+        key.append(getattr(car, column_name))
+    raw = json.dumps(key, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> list:
+    """Decode a cursor, checking that it was issued for the same sort order"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        valid = (
+            isinstance(key, list)
+            and key[0] == sort
+            and all(isinstance(value, int) for value in key[1:])
+            and len(key) == (3 if SORT_OPTIONS[sort][0] else 2)
+        )
+    except (ValueError, TypeError, KeyError, IndexError):
+        valid = False
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key[1:]
+
+
+def apply_cursor(stmt, sort: str, cursor: str):
+    """Keep only the rows after the cursor (keyset pagination, no OFFSET)"""
+    column_name, descending = _sort_option(sort)
+    key = decode_cursor(cursor, sort)
+    Car = models.Car
+    if column_name:
+        car_id, value = key
+        row = tuple_(getattr(Car, column_name), Car.id)
+        bound = tuple_(value, car_id)
+        return stmt.where(row < bound if descending else row > bound)
+    car_id = key[0]
+    return stmt.where(Car.id < car_id if descending else Car.id > car_id)
+
+
+def page_statement(stmt, sort: str, limit: int, cursor: Optional[str] = None):
+    """
+    Order, position and limit a filtered Car select to one page.
+    One extra row is fetched to know whether there is a next page.
+    """
+    stmt = apply_sort(stmt, sort)
+    if cursor:
+        stmt = apply_cursor(stmt, sort, cursor)
+    return stmt.limit(limit + 1)
+
+
+def split_page(cars: list, sort: str, limit: int):
+    """
+    Split the rows of page_statement() into (cars, next_cursor);
+    next_cursor is None on the last page.
+    """
+    if len(cars) <= limit:
+        return cars, None
+    cars = cars[:limit]
+    return cars, encode_cursor(sort, cars[-1])
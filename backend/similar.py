@@ -0,0 +1,344 @@
+# backend/similar.py
+# "Similar cars": the k nearest listings of every car, computed in vectorized
+# blocks and kept in memory so serving a car's neighbours is a row lookup.
+import os
+import threading
+import time
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+import search
+from lazy import lazy_import
+from log import get_logger
+
+# Optional: without NumPy the endpoint answers 501. Loaded by build().
+np = lazy_import("numpy")
+
+logger = get_logger("similar")
+
+SIMILAR_ENABLED = os.getenv("SIMILAR_ENABLED", "1") == "1" and np is not None
+# Neighbours kept per car (the endpoint's maximum limit)
+SIMILAR_K = int(os.getenv("SIMILAR_K", "12"))
+SIMILAR_DEFAULT_LIMIT = 6
+# Distance matrix cells computed at once (rows per block = this // cars)
+SIMILAR_BLOCK_CELLS = int(os.getenv("SIMILAR_BLOCK_CELLS", "4000000"))
+# sync() rebuilds instead of put/remove once more than this share of the cars changed
+SIMILAR_SYNC_MAX_SHARE = float(os.getenv("SIMILAR_SYNC_MAX_SHARE", "0.05"))
+
+# Numeric features: log price, year, log mileage, each in standard deviations
+NUMERIC_WEIGHTS = (1.0, 1.0, 1.0)
+# Categorical features: added to the distance when they differ
+CATEGORICAL = ("brand", "fuel", "transmission", "color")
+CATEGORICAL_WEIGHTS = (1.0, 0.6, 0.3, 0.15)
+
+
+def _numeric(car) -> tuple:
+    return (np.log1p(max(car.price or 0, 0)), car.year or 0, np.log1p(max(car.mileage or 0, 0)))
+
+
+def _raw(car) -> tuple:
+    """Everything the distance depends on, to spot changed cars in sync()"""
+    return (search.extract_brand(car.name), car.fuel, car.transmission, car.color,
+            car.price, car.year, car.mileage)
+
+
+def _columns():
+    Car = models.Car
+    return (Car.id, Car.name, Car.price, Car.year, Car.mileage, Car.fuel, Car.transmission, Car.color)
+
+
+class SimilarIndex:
+    """
+    Top SIMILAR_K neighbours per car under a weighted distance: squared
+    differences of the standardized numeric features plus a fixed penalty
+    per categorical feature that differs.
+
+    The full build compares every car with every other one, block by block.
+    A write only touches the cars it can affect: the written car gets a
+    fresh list (one row of distances), cars it now beats are updated by
+    merging it into their lists, and cars that listed it before an update
+    or delete are recomputed. Means and deviations are fixed at build time.
+
+    Per process: refresh() catches up with every worker's writes on a
+    background thread (sync(): put/remove of the cars that changed, or a
+    full build when many did), so neither startup nor a request waits for
+    the O(cars^2) build.
+    """
+
+    def __init__(self, k: int = SIMILAR_K):
+        self.k = k
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._sync_thread = None
+        self._sync_wanted = False
+        # The arrays come with build(), so NumPy is only loaded then
+        self.positions = {}
+        self.raw = {}
+        self.loaded = False
+
+    def _reset(self, capacity: int = 0):
+        self.ids = np.zeros(capacity, np.int64)
+        self.alive = np.zeros(capacity, np.bool_)
+        self.numeric = np.zeros((capacity, 3), np.float32)
+        self.codes = np.zeros((capacity, len(CATEGORICAL)), np.int32)
+        self.neighbours = np.full((capacity, self.k), -1, np.int32)  # rows, nearest first
+        self.distances = np.full((capacity, self.k), np.inf, np.float32)
+        self.dictionaries = {name: {} for name in CATEGORICAL}
+        self.center = np.zeros(3, np.float32)
+        self.scale = np.ones(3, np.float32)
+        self.size = 0
+        self.positions = {}  # car id -> row
+        self.raw = {}  # car id -> _raw(car)
+        self._features = None  # see _feature_matrix()
+        self._norms = None
+        self.loaded = False
+
+    # ----- features -----
+
+    def _codes(self, car) -> list:
+        values = (search.extract_brand(car.name), car.fuel, car.transmission, car.color)
+        codes = []
+        for name, value in zip(CATEGORICAL, values):
+            dictionary = self.dictionaries[name]
+            code = dictionary.get(value)
+            if code is None:
+                code = dictionary[value] = len(dictionary)
+                self._features = None  # one more one-hot column
+            codes.append(code)
+        return codes
+
+    def _feature_matrix(self):
+        """
+        Numeric features times sqrt(weight) next to one-hot categories times
+        sqrt(weight / 2), so the distance is a plain squared Euclidean one and
+        a block of distances is one matrix product. Rebuilt when a category
+        value is added.
+        """
+        if self._features is None or len(self._features) < self.size:
+            n = self.size
+            width = 3 + sum(len(self.dictionaries[name]) for name in CATEGORICAL)
+            features = np.zeros((len(self.ids), width), np.float32)
+            features[:n, :3] = self.numeric[:n] * np.sqrt(NUMERIC_WEIGHTS, dtype=np.float32)
+            offset = 3
+            for f, (name, weight) in enumerate(zip(CATEGORICAL, CATEGORICAL_WEIGHTS)):
+                features[np.arange(n), offset + self.codes[:n, f]] = np.sqrt(weight / 2)
+                offset += len(self.dictionaries[name])
+            self._features = features
+            self._norms = np.einsum("ij,ij->i", features, features)
+        return self._features
+
+    def _update_features(self, row: int):
+        if self._features is None or row >= len(self._features):
+            self._features = None
+            return
+        features = self._features
+        features[row] = 0
+        features[row, :3] = self.numeric[row] * np.sqrt(NUMERIC_WEIGHTS, dtype=np.float32)
+        offset = 3
+        for f, (name, weight) in enumerate(zip(CATEGORICAL, CATEGORICAL_WEIGHTS)):
+            features[row, offset + self.codes[row, f]] = np.sqrt(weight / 2)
+            offset += len(self.dictionaries[name])
+        self._norms[row] = features[row] @ features[row]
+
+    def _distances(self, rows) -> "np.ndarray":
+        """Distances from `rows` to every row (len(rows) x size); dead rows and self are inf"""
+        n = self.size
+        features = self._feature_matrix()[:n]
+        norms = self._norms[:n]
+        result = features[rows] @ features.T
+        result *= -2
+        result += norms[rows][:, None]
+        result += norms[None, :]
+        np.maximum(result, 0, out=result)
+        result[:, ~self.alive[:n]] = np.inf
+        result[np.arange(len(rows)), rows] = np.inf
+        return result
+
+    def _nearest(self, distances) -> tuple:
+        """(rows, distances) of the k smallest per line, nearest first"""
+        k = min(self.k, distances.shape[1])
+        if k == 0:
+            return (np.full((len(distances), self.k), -1, np.int32),
+                    np.full((len(distances), self.k), np.inf, np.float32))
+        top = np.argpartition(distances, k - 1, axis=1)[:, :k] if distances.shape[1] > k \
+            else np.tile(np.arange(k), (len(distances), 1))
+        top_distances = np.take_along_axis(distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1).astype(np.int32)
+        top_distances = np.take_along_axis(top_distances, order, axis=1)
+        top[np.isinf(top_distances)] = -1
+        if k < self.k:
+            top = np.pad(top, ((0, 0), (0, self.k - k)), constant_values=-1)
+            top_distances = np.pad(top_distances, ((0, 0), (0, self.k - k)), constant_values=np.inf)
+        return top, top_distances
+
+    def _recompute(self, rows):
+        """Fresh neighbour lists for `rows`, in blocks"""
+        rows = np.asarray(rows, np.int64)
+        block = max(1, SIMILAR_BLOCK_CELLS // max(self.size, 1))
+        for start in range(0, len(rows), block):
+            chunk = rows[start:start + block]
+            self.neighbours[chunk], self.distances[chunk] = self._nearest(self._distances(chunk))
+
+    # ----- building -----
+
+    def build(self, bind):
+        """(Re)compute every neighbour list from the cars table; queries use the old lists meanwhile"""
+        started = time.perf_counter()
+        with Session(bind) as db:
+            cars = db.execute(select(*_columns()).order_by(models.Car.id)).all()
+
+        fresh = SimilarIndex(self.k)
+        fresh._reset(len(cars))
+        fresh.size = len(cars)
+        fresh.ids[:] = [car.id for car in cars]
+        fresh.alive[:] = True
+        fresh.positions = {car.id: row for row, car in enumerate(cars)}
+        fresh.raw = {car.id: _raw(car) for car in cars}
+        numeric = np.array([_numeric(car) for car in cars], np.float64).reshape(-1, 3)
+        if len(cars):
+            fresh.center = numeric.mean(axis=0).astype(np.float32)
+            fresh.scale = np.where(numeric.std(axis=0) > 0, numeric.std(axis=0), 1).astype(np.float32)
+        fresh.numeric[:] = (numeric - fresh.center) / fresh.scale
+        fresh.codes[:] = np.array([fresh._codes(car) for car in cars], np.int32).reshape(-1, len(CATEGORICAL))
+        fresh._recompute(np.arange(fresh.size))
+
+        with self._lock:
+            for name in ("ids", "alive", "numeric", "codes", "neighbours", "distances", "dictionaries",
+                         "center", "scale", "size", "positions", "raw", "_features", "_norms"):
+                setattr(self, name, getattr(fresh, name))
+            self.loaded = True
+        logger.info("🧭 Similar cars computed for %d cars in %.2fs", self.size, time.perf_counter() - started)
+
+    def sync(self, bind):
+        """Catch up with the cars table: put/remove what changed, or build() if too much did"""
+        if not self.loaded:
+            self.build(bind)
+            return
+        with Session(bind) as db:
+            cars = db.execute(select(*_columns())).all()
+        with self._lock:
+            known = dict(self.raw)
+        changed = [car for car in cars if known.pop(car.id, None) != _raw(car)]
+        if len(changed) + len(known) > max(1, self.size * SIMILAR_SYNC_MAX_SHARE):
+            self.build(bind)
+            return
+        for car in changed:
+            self.put(car)
+        for car_id in known:  # not in the table any more
+            self.remove(car_id)
+        if changed or known:
+            logger.info("🧭 Similar cars synced: %d changed, %d removed", len(changed), len(known))
+
+    def refresh(self, bind):
+        """sync() on a background thread; calls while one runs get one more run after it"""
+        with self._sync_lock:
+            self._sync_wanted = True
+            if self._sync_thread is not None:
+                return
+            self._sync_thread = threading.Thread(target=self._sync_loop, args=(bind,),
+                                                 name="similar-sync", daemon=True)
+            self._sync_thread.start()
+
+    def _sync_loop(self, bind):
+        while True:
+            with self._sync_lock:
+                if not self._sync_wanted:
+                    self._sync_thread = None
+                    return
+                self._sync_wanted = False
+            try:
+                self.sync(bind)
+            except Exception as e:
+                logger.error("Syncing similar cars failed: %s", e)
+
+    def _reserve(self, rows: int):
+        capacity = len(self.ids)
+        if rows <= capacity:
+            return
+        capacity = max(1024, 2 * capacity, rows)
+        for name, fill in (("ids", 0), ("alive", False), ("numeric", 0), ("codes", 0),
+                           ("neighbours", -1), ("distances", np.inf)):
+            old = getattr(self, name)
+            grown = np.full((capacity,) + old.shape[1:], fill, old.dtype)
+            grown[:self.size] = old[:self.size]
+            setattr(self, name, grown)
+
+    def _listed_by(self, row: int) -> "np.ndarray":
+        """Rows whose neighbour list contains `row`"""
+        return np.flatnonzero((self.neighbours[:self.size] == row).any(axis=1))
+
+    # ----- incremental updates -----
+
+    def put(self, car):
+        """A car was added or updated: O(cars) work, not a rebuild"""
+        if not self.loaded:
+            return
+        with self._lock:
+            row = self.positions.get(car.id)
+            if row is None:
+                self._reserve(self.size + 1)
+                row = self.size
+                self.size += 1
+                self.positions[car.id] = row
+                stale = np.empty(0, np.int64)
+            else:
+                stale = self._listed_by(row)
+            self.ids[row] = car.id
+            self.alive[row] = True
+            self.raw[car.id] = _raw(car)
+            self.numeric[row] = (np.array(_numeric(car), np.float32) - self.center) / self.scale
+            self.codes[row] = self._codes(car)
+            self._update_features(row)
+
+            # Its own list, from one row of distances (symmetric: also its distance to everyone)
+            distances = self._distances(np.array([row]))
+            self.neighbours[row], self.distances[row] = (part[0] for part in self._nearest(distances))
+            distances = distances[0]
+
+            # Cars that listed it may have lost it: recompute those
+            if len(stale):
+                self._recompute(stale)
+
+            # Cars it is now closer to than their current k-th neighbour: merge it in
+            candidates = np.flatnonzero(distances < self.distances[:self.size, -1])
+            candidates = candidates[~(self.neighbours[candidates] == row).any(axis=1)]
+            if len(candidates):
+                merged_rows = np.hstack([self.neighbours[candidates], np.full((len(candidates), 1), row, np.int32)])
+                merged = np.hstack([self.distances[candidates], distances[candidates, None]])
+                order = np.argsort(merged, axis=1, kind="stable")[:, :self.k]
+                self.neighbours[candidates] = np.take_along_axis(merged_rows, order, axis=1)
+                self.distances[candidates] = np.take_along_axis(merged, order, axis=1)
+
+    def remove(self, car_id: int):
+        """A car was deleted: recompute only the cars that listed it"""
+        if not self.loaded:
+            return
+        with self._lock:
+            row = self.positions.pop(car_id, None)
+            if row is None:
+                return
+            self.raw.pop(car_id, None)
+            self.alive[row] = False
+            self.neighbours[row] = -1
+            self.distances[row] = np.inf
+            stale = self._listed_by(row)
+            if len(stale):
+                self._recompute(stale)
+
+    # ----- serving -----
+
+    def similar(self, car_id: int, limit: int = SIMILAR_DEFAULT_LIMIT) -> Optional[List[int]]:
+        """Ids of the nearest `limit` cars, nearest first; None for an unknown car"""
+        with self._lock:
+            row = self.positions.get(car_id)
+            if row is None:
+                return None
+            rows = self.neighbours[row, :limit]
+            return self.ids[rows[rows >= 0]].tolist()
+
+
+index = SimilarIndex() if SIMILAR_ENABLED else None
@@ -0,0 +1,450 @@
+# backend/snapshot.py
+# Columnar in-memory snapshot of the searchable car fields for the browse path.
+# Filters run as NumPy masks and sorts as a partial argsort, so a page of ids
+# costs no SQL; only the page's rows are then fetched by primary key.
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import catalogversion
+import models
+import search
+from lazy import lazy_import
+from log import get_logger
+
+# Optional: without NumPy the SQL path is used. Loaded when a snapshot is built.
+np = lazy_import("numpy")
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock file, workers may rebuild at the same time
+    fcntl = None
+
+logger = get_logger("snapshot")
+
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "1") == "1" and np is not None
+SNAPSHOT_DIR = os.getenv(
+    "SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshot_data")
+)
+FORMAT_VERSION = 2
+
+CATEGORICAL = ("brand", "fuel", "transmission", "color")
+ENGINE_SIZE_BITS = {size: 1 << i for i, size in enumerate(search.ENGINE_SIZES)}
+# Sort keys are (value << ID_BITS) | id, so ids must stay below 2**ID_BITS
+ID_BITS = 31
+
+DTYPES = {
+    "id": "int64",
+    "price": "int64",
+    "year": "int32",
+    "mileage": "int64",
+    "featured": "bool",
+    "engine_size": "uint8",  # bit per search.ENGINE_SIZES bucket
+    "alive": "bool",  # False once the car is deleted
+    "brand": "int32",  # dictionary codes, -1 for NULL
+    "fuel": "int32",
+    "transmission": "int32",
+    "color": "int32",
+}
+
+
+class Dictionary:
+    """Value <-> small integer code for one categorical column"""
+    __slots__ = ("values", "codes")
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+
+    def encode(self, value) -> int:
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def engine_size_bits(engine: Optional[str]) -> int:
+    """Same buckets as search.engine_size_condition (lower(engine) contains a fragment)"""
+    if not engine:
+        return 0
+    engine = engine.lower()
+    bits = 0
+    for size, fragments in search.ENGINE_SIZES.items():
+        if any(fragment in engine for fragment in fragments):
+            bits |= ENGINE_SIZE_BITS[size]
+    return bits
+
+
+def _snapshot_columns():
+    Car = models.Car
+    return (Car.id, Car.name, Car.price, Car.year, Car.mileage, Car.featured,
+            Car.engine, Car.fuel, Car.transmission, Car.color)
+
+
+class InventorySnapshot:
+    """
+    Columns of price/year/mileage/featured/engine size plus dictionary-encoded
+    brand/fuel/transmission/color, one row per car. Writes update rows in
+    place (deletes leave a tombstone).
+
+    Every snapshot is tagged with the catalogversion counter it was built
+    from. A copy persisted at the current version is loaded copy-on-write
+    memory-mapped instead of rebuilt; refresh() (on startup and whenever
+    catalogversion.watcher sees the cars move) rebuilds and persists once
+    any worker wrote.
+    """
+
+    def __init__(self, directory: str = SNAPSHOT_DIR):
+        self.directory = directory
+        self._lock = threading.RLock()
+        self._build_mutex = threading.Lock()
+        self._pending = None  # writes applied while build() runs, replayed on its result
+        self._reset()
+
+    def _reset(self, capacity: Optional[int] = None):
+        # No arrays until built or loaded (capacity None), so NumPy loads then
+        self.columns = {} if capacity is None else {
+            name: np.zeros(capacity, dtype) for name, dtype in DTYPES.items()
+        }
+        self.dictionaries = {name: Dictionary() for name in CATEGORICAL}
+        self.size = 0
+        self.positions = {}  # car id -> row
+        self.version = None  # catalogversion it was built from
+        self.loaded = False
+
+    # ----- building -----
+
+    def _fields(self, car) -> dict:
+        featured = bool(car.featured)
+        return {
+            "id": car.id,
+            "price": car.price,
+            "year": car.year,
+            "mileage": car.mileage,
+            "featured": featured,
+            "engine_size": engine_size_bits(car.engine),
+            "alive": True,
+            "brand": self.dictionaries["brand"].encode(search.extract_brand(car.name)),
+            "fuel": self.dictionaries["fuel"].encode(car.fuel),
+            "transmission": self.dictionaries["transmission"].encode(car.transmission),
+            "color": self.dictionaries["color"].encode(car.color),
+        }
+
+    def build(self, bind):
+        """(Re)build from the cars table; queries use the previous arrays meanwhile"""
+        started = time.perf_counter()
+        with self._build_mutex:
+            with self._lock:
+                self._pending = []
+            try:
+                # Read first: a write during the scan leaves the tag behind, never ahead
+                version = catalogversion.current(bind)
+                fresh = InventorySnapshot(self.directory)
+                with Session(bind) as db:
+                    total = db.scalar(select(func.count(models.Car.id))) or 0
+                    result = db.execute(
+                        select(*_snapshot_columns()).order_by(models.Car.id).execution_options(yield_per=50000)
+                    )
+                    fresh._reset(total)
+                    for rows in result.partitions():
+                        batch = [fresh._fields(car) for car in rows]
+                        start = fresh.size
+                        fresh._reserve(start + len(batch))
+                        for name, column in fresh.columns.items():
+                            column[start:start + len(batch)] = [fields[name] for fields in batch]
+                        fresh.positions.update((fields["id"], start + i) for i, fields in enumerate(batch))
+                        fresh.size += len(batch)
+                with self._lock:
+                    self.columns, self.dictionaries = fresh.columns, fresh.dictionaries
+                    self.size, self.positions = fresh.size, fresh.positions
+                    self.version = version
+                    self.loaded = True
+                    for change in self._pending:
+                        self._apply(change)
+            finally:
+                with self._lock:
+                    self._pending = None
+        logger.info("📸 Inventory snapshot built: %d cars in %.2fs", self.size, time.perf_counter() - started)
+
+    def _reserve(self, rows: int):
+        if rows > len(self.columns["id"]):
+            capacity = max(1024, 2 * len(self.columns["id"]), rows)
+            for name, column in self.columns.items():
+                grown = np.zeros(capacity, column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.columns[name] = grown
+
+    def _append(self, fields: dict):
+        self._reserve(self.size + 1)
+        row = self.size
+        self.size += 1
+        self._write(row, fields)
+
+    def _write(self, row: int, fields: dict):
+        for name, value in fields.items():
+            self.columns[name][row] = value
+        self.positions[fields["id"]] = row
+
+    # ----- incremental updates -----
+
+    def _apply(self, change: tuple):
+        action, value = change
+        if action == "put":
+            fields = self._fields(value)
+            row = self.positions.get(value.id)
+            if row is None:
+                self._append(fields)
+            else:
+                self._write(row, fields)
+        else:
+            row = self.positions.pop(value, None)
+            if row is not None:
+                self.columns["alive"][row] = False
+
+    def _record(self, change: tuple):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(change)
+            if self.loaded:
+                self._apply(change)
+
+    def put(self, car):
+        """A car was added or updated (this process's write; other workers' come with refresh())"""
+        values = {column.key: getattr(car, column.key) for column in _snapshot_columns()}
+        self._record(("put", SimpleNamespace(**values)))
+
+    def remove(self, car_id: int):
+        """A car was deleted"""
+        self._record(("remove", car_id))
+
+    # ----- queries -----
+
+    def _category_mask(self, name: str, value, n: int):
+        code = self.dictionaries[name].codes.get(value)
+        if code is None:
+            return np.zeros(n, dtype=bool)
+        return self.columns[name][:n] == code
+
+    def query(self, filters: search.CarFilters, sort: str, limit: int,
+              cursor: Optional[str] = None) -> Optional[List[int]]:
+        """
+        Ids of the page search.page_statement() would return (limit + 1 rows,
+        same order and cursor semantics), or None if the filters need SQL.
+        """
+        active = filters.active()
+        brand = active.get("brand")
+        if brand is not None and brand not in search.BRANDS and brand != search.OTHER_BRAND:
+            return None  # free-text brand: a LIKE on the name
+        column_name, descending = search.SORT_OPTIONS[sort] if sort in search.SORT_OPTIONS else (None, None)
+        if descending is None:
+            return None
+        if "engine_size" in active and active["engine_size"] not in ENGINE_SIZE_BITS:
+            return None  # let the SQL path report the error
+        key_bound = search.decode_cursor(cursor, sort) if cursor else None
+
+        with self._lock:
+            n = self.size
+            columns = self.columns
+            ids = columns["id"][:n]
+            mask = columns["alive"][:n].copy()
+
+            if brand is not None:
+                mask &= self._category_mask("brand", brand, n)
+            for name in ("fuel", "transmission", "color"):
+                if name in active:
+                    mask &= self._category_mask(name, active[name], n)
+            if "engine_size" in active:
+                mask &= (columns["engine_size"][:n] & ENGINE_SIZE_BITS[active["engine_size"]]) != 0
+            for name, column, minimum in (
+                ("price_min", "price", True), ("price_max", "price", False),
+                ("year_min", "year", True), ("year_max", "year", False),
+                ("mileage_max", "mileage", False),
+            ):
+                if name in active:
+                    values = columns[column][:n]
+                    mask &= values >= active[name] if minimum else values <= active[name]
+
+            sort_values = columns[column_name][:n] if column_name else None
+            if key_bound is not None:
+                if column_name:
+                    car_id, value = key_bound
+                    if descending:
+                        mask &= (sort_values < value) | ((sort_values == value) & (ids < car_id))
+                    else:
+                        mask &= (sort_values > value) | ((sort_values == value) & (ids > car_id))
+                else:
+                    mask &= ids < key_bound[0] if descending else ids > key_bound[0]
+
+            rows = np.flatnonzero(mask)
+            if not len(rows):
+                return []
+            keys = ids[rows]
+            if column_name:
+                values = sort_values[rows].astype(np.int64)
+                keys = ((values - values.min()) << ID_BITS) | keys
+            if descending:
+                keys = -keys
+
+            count = limit + 1
+            if len(keys) > count:
+                top = np.argpartition(keys, count - 1)[:count]
+                order = top[np.argsort(keys[top], kind="stable")]
+            else:
+                order = np.argsort(keys, kind="stable")
+            return ids[rows[order]].tolist()
+
+    def page(self, filters: search.CarFilters, sort: str, limit: int,
+             cursor: Optional[str] = None) -> Optional[tuple]:
+        """
+        (ids, next_cursor) of one page from query(), or None if the filters
+        need SQL. The cursor comes from the snapshot's own values, so a car
+        deleted since (its row missing from the fetch) can't end the listing.
+        """
+        with self._lock:
+            ids = self.query(filters, sort, limit, cursor)
+            if ids is None:
+                return None
+            if len(ids) <= limit:
+                return ids, None
+            ids = ids[:limit]
+            row = self.positions[ids[-1]]
+            last = SimpleNamespace(id=ids[-1], **{
+                name: int(self.columns[name][row]) for name in ("price", "year", "mileage")
+            })
+            return ids, search.encode_cursor(sort, last)
+
+    # ----- persistence -----
+
+    def _path(self, name: str, token: str) -> str:
+        return os.path.join(self.directory, f"{name}.{token}.npy")
+
+    def save(self):
+        """
+        Write the live rows as .npy files under a name unique to this writer
+        (pid + uuid), then atomically point meta.json at them
+        """
+        with self._lock:
+            if not self.loaded:
+                return
+            n = self.size
+            alive = self.columns["alive"][:n]
+            arrays = {name: column[:n][alive] for name, column in self.columns.items()}
+            meta = {
+                "format": FORMAT_VERSION,
+                "version": self.version,
+                "token": f"{os.getpid()}-{uuid.uuid4().hex}",
+                "size": int(alive.sum()),
+                "dictionaries": {name: d.values for name, d in self.dictionaries.items()},
+                "saved_at": time.time(),
+            }
+
+        os.makedirs(self.directory, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(self._path(name, meta["token"]), array)
+        meta_path = os.path.join(self.directory, "meta.json")
+        with open(f"{meta_path}.{meta['token']}.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.{meta['token']}.tmp", meta_path)
+
+        # Older copies; processes that mapped them keep their mapping. Recent
+        # ones may belong to a writer about to publish its meta.json.
+        for filename in os.listdir(self.directory):
+            parts = filename.split(".")
+            if filename.endswith(".npy") and len(parts) == 3 and parts[1] != meta["token"]:
+                path = os.path.join(self.directory, filename)
+                try:
+                    if time.time() - os.path.getmtime(path) > 60:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    @contextmanager
+    def _build_lock(self, blocking: bool):
+        """Lock file around rebuild + save across workers; yields False if another one holds it"""
+        if fcntl is None:
+            yield True
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "build.lock"), "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _map(self, version: Optional[int]) -> bool:
+        """Map the persisted snapshot if it was built at `version`"""
+        if version is None:
+            return False
+        try:
+            with open(os.path.join(self.directory, "meta.json")) as f:
+                meta = json.load(f)
+            if meta.get("format") != FORMAT_VERSION or meta["version"] != version:
+                return False
+            columns = {
+                name: np.load(self._path(name, meta["token"]), mmap_mode="c")
+                for name in DTYPES
+            }
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Inventory snapshot unreadable (%s), rebuilding", e)
+            return False
+
+        with self._lock:
+            self._reset()
+            self.columns = columns
+            self.size = meta["size"]
+            self.dictionaries = {
+                name: Dictionary(values) for name, values in meta["dictionaries"].items()
+            }
+            self.positions = dict(zip(columns["id"].tolist(), range(self.size)))
+            self.version = version
+            self.loaded = True
+        logger.info("📸 Inventory snapshot mapped: %d cars (version %d)", self.size, version)
+        return True
+
+    def refresh(self, bind, blocking: bool = False) -> str:
+        """
+        Catch up with the cars version in the database: nothing if the
+        snapshot is current, else map the persisted copy if that one is,
+        else rebuild and persist it. One worker rebuilds at a time; without
+        `blocking` the others skip and map its copy on their next refresh.
+        Returns "current", "mapped", "built" or "busy".
+        """
+        version = catalogversion.current(bind)
+        if self.loaded and version is not None and version == self.version:
+            return "current"
+        if self._map(version):
+            return "mapped"
+        with self._build_lock(blocking) as acquired:
+            if not acquired:
+                return "busy"
+            if self._map(catalogversion.current(bind)):  # rebuilt while we waited
+                return "mapped"
+            logger.info("📸 Inventory snapshot out of date, rebuilding")
+            self.build(bind)
+            self.save()
+            return "built"
+
+    def load(self, bind) -> bool:
+        """Startup: map the persisted snapshot or build and persist it. Returns True if mapped."""
+        return self.refresh(bind, blocking=True) == "mapped"
+
+
+inventory = InventorySnapshot() if SNAPSHOT_ENABLED else None
@@ -0,0 +1,192 @@
+# backend/suggest.py
+import heapq
+import os
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+import search
+
+SUGGEST_DEFAULT_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+# Prefixes whose ranked completions are kept (LRU)
+SUGGEST_CACHE_SIZE = int(os.getenv("SUGGEST_CACHE_SIZE", "10000"))
+# A featured listing counts as this many plain ones when ranking
+FEATURED_WEIGHT = 5
+
+_word_start = re.compile(r"(?<![\w])\w")
+
+
+def normalize(value: str) -> str:
+    return " ".join(value.casefold().split())
+
+
+def car_terms(car) -> tuple:
+    """(kind, text) suggestions contributed by one car"""
+    terms = []
+    brand = search.extract_brand(car.name)
+    if brand != search.OTHER_BRAND:
+        terms.append(("brand", brand))
+    for kind, value in (("model", car.name), ("engine", car.engine), ("color", car.color)):
+        if value and value.strip():
+            terms.append((kind, " ".join(value.split())))
+    return tuple(terms)
+
+
+class SuggestIndex:
+    """
+    Sorted-array prefix index over brand, model name, engine and color.
+
+    Every term is stored under its full text and under each later word
+    start ("s-class" and "class" for "Mercedes-Benz S-Class"), so typing any
+    word of a term finds it. Terms are counted per listing; a term whose
+    last listing goes away is dropped.
+
+    Ranking every match of a short prefix is linear in the matches, so the
+    ranked completions of each prefix are memoized; a write only drops the
+    prefixes of the keys it touched. Single characters are warmed on load.
+
+    The index is per process: this worker's writes go through put/remove,
+    other workers' reach it as a reload when catalogversion.watcher sees the
+    cars counter move.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []  # sorted (prefix key, kind, text)
+        self._stats = {}  # (kind, text) -> [listings, featured listings]
+        self._car_terms = {}  # car id -> (terms, featured)
+        self._ranked = OrderedDict()  # prefix -> top SUGGEST_MAX_LIMIT terms
+        self.loaded = False
+
+    def _keys_for(self, kind: str, text: str) -> list:
+        normalized = normalize(text)
+        return [(normalized[match.start():], kind, text) for match in _word_start.finditer(normalized)]
+
+    def _forget_prefixes(self, keys: list):
+        for key, _, _ in keys:
+            for end in range(1, len(key) + 1):
+                self._ranked.pop(key[:end], None)
+
+    def _add_terms(self, terms: tuple, featured: bool):
+        for term in terms:
+            keys = self._keys_for(*term)
+            stats = self._stats.get(term)
+            if stats is None:
+                stats = self._stats[term] = [0, 0]
+                for key in keys:
+                    insort(self._keys, key)
+            stats[0] += 1
+            stats[1] += 1 if featured else 0
+            self._forget_prefixes(keys)
+
+    def _remove_terms(self, terms: tuple, featured: bool):
+        for term in terms:
+            keys = self._keys_for(*term)
+            stats = self._stats[term]
+            stats[0] -= 1
+            stats[1] -= 1 if featured else 0
+            if stats[0] == 0:
+                del self._stats[term]
+                for key in keys:
+                    position = bisect_left(self._keys, key)
+                    if position < len(self._keys) and self._keys[position] == key:
+                        del self._keys[position]
+            self._forget_prefixes(keys)
+
+    def _rank(self, prefix: str) -> list:
+        """Top SUGGEST_MAX_LIMIT (kind, text) terms for a prefix (lock held)"""
+        ranked = self._ranked.get(prefix)
+        if ranked is not None:
+            self._ranked.move_to_end(prefix)
+            return ranked
+
+        keys = self._keys
+        start = bisect_left(keys, (prefix,))
+        end = bisect_left(keys, (prefix + "\U0010ffff",), start)
+        terms = {(kind, text) for _, kind, text in keys[start:end]}
+        stats = self._stats
+
+        def order(term):
+            listings, featured = stats[term]
+            return (-(listings + (FEATURED_WEIGHT - 1) * featured), len(term[1]), term[1])
+
+        ranked = heapq.nsmallest(SUGGEST_MAX_LIMIT, terms, key=order)
+        self._ranked[prefix] = ranked
+        while len(self._ranked) > SUGGEST_CACHE_SIZE:
+            self._ranked.popitem(last=False)
+        return ranked
+
+    def load(self, bind):
+        """(Re)build from the cars table"""
+        Car = models.Car
+        with Session(bind) as db:
+            rows = db.execute(select(Car.id, Car.name, Car.engine, Car.color, Car.featured)).all()
+
+        stats = {}
+        car_terms_by_id = {}
+        for row in rows:
+            terms = car_terms(row)
+            car_terms_by_id[row.id] = (terms, bool(row.featured))
+            for term in terms:
+                entry = stats.setdefault(term, [0, 0])
+                entry[0] += 1
+                entry[1] += 1 if row.featured else 0
+        keys = sorted(key for term in stats for key in self._keys_for(*term))
+
+        with self._lock:
+            self._keys = keys
+            self._stats = stats
+            self._car_terms = car_terms_by_id
+            self._ranked = OrderedDict()
+            self.loaded = True
+            for first in sorted({key[0][0] for key in keys}):
+                self._rank(first)
+
+    def put(self, car):
+        """A car was added or updated"""
+        terms = car_terms(car)
+        featured = bool(car.featured)
+        with self._lock:
+            previous = self._car_terms.get(car.id)
+            if previous is not None:
+                self._remove_terms(*previous)
+            self._add_terms(terms, featured)
+            self._car_terms[car.id] = (terms, featured)
+
+    def remove(self, car_id: int):
+        """A car was deleted"""
+        with self._lock:
+            previous = self._car_terms.pop(car_id, None)
+            if previous is not None:
+                self._remove_terms(*previous)
+
+    def suggest(self, q: str, limit: int = SUGGEST_DEFAULT_LIMIT) -> List[dict]:
+        """Top `limit` terms with a word starting with `q`, most listed (featured weighted) first"""
+        prefix = normalize(q)
+        if not prefix:
+            return []
+        with self._lock:
+            return [
+                {"text": text, "kind": kind, "count": self._stats[(kind, text)][0],
+                 "featured": self._stats[(kind, text)][1]}
+                for kind, text in self._rank(prefix)[:limit]
+            ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "terms": len(self._stats),
+                "keys": len(self._keys),
+                "cars": len(self._car_terms),
+                "cached_prefixes": len(self._ranked),
+            }
+
+
+index = SuggestIndex()
@@ -0,0 +1,91 @@
+# backend/test/bench_async.py
+"""
+Throughput of the catalog read endpoints with the async database path
+(DB_ASYNC=1) vs the sync fallback (DB_ASYNC=0).
+
+Each mode runs in its own process against the DATABASE_URL from .env,
+in-process through httpx's ASGI transport, with the catalog cache off so
+every request reaches the database.
+
+    cd backend
+    python test/bench_async.py --requests 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+async def run_load(total: int, concurrency: int) -> dict:
+    import httpx
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    # ASGITransport doesn't send lifespan events: run startup/shutdown here
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        car_ids = [car["id"] for car in (await client.get("/api/cars")).json()]
+        if not car_ids:
+            raise SystemExit("No cars in the database - POST /api/seed first")
+
+        paths = ["/api/cars?limit=24", "/api/cars/featured"]
+        latencies = []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            path = paths[i % 3] if i % 3 < 2 else f"/api/cars/{random.choice(car_ids)}"
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(total)])
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "req_per_s": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = asyncio.run(run_load(args.requests, args.concurrency))
+        print("RESULT " + json.dumps(result))
+        return
+
+    for mode, label in (("0", "sync fallback"), ("1", "async")):
+        env = dict(os.environ, DB_ASYNC=mode, CATALOG_CACHE_SIZE="0")
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child",
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+        )
+        lines = [line for line in output.stdout.splitlines() if line.startswith("RESULT ")]
+        if not lines:
+            print(f"{label}: failed\n{output.stdout[-2000:]}{output.stderr[-2000:]}")
+            continue
+        print(f"{label:>14}: {lines[-1][len('RESULT '):]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# backend/test/bench_import.py
+"""
+Rows per second of POST /api/cars (one car per request) vs the bulk
+POST /api/cars/import, against the DATABASE_URL from .env, in-process
+through httpx's ASGI transport. A bench owner is created on first run;
+the imported cars are deleted afterwards.
+
+    cd backend
+    python test/bench_import.py --single 500 --bulk 50000
+"""
+import argparse
+import asyncio
+import csv
+import io
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BENCH_NAME = "Bench Import"
+
+
+def bench_owner_token() -> str:
+    import auth
+    import models
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.username == "bench-owner").first()
+        if user is None:
+            user = models.User(
+                email="bench-owner@example.com", username="bench-owner",
+                hashed_password=auth.get_password_hash("bench-owner-password"),
+                full_name="Import Benchmark", role="owner",
+            )
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+        return auth.create_user_token(user)
+    finally:
+        db.close()
+
+
+def car(i: int) -> dict:
+    return {
+        "name": f"{BENCH_NAME} {i}",
+        "price": random.randint(5000, 300000),
+        "year": random.randint(2000, 2024),
+        "mileage": random.randint(0, 250000),
+        "image": "https://example.com/car.jpg",
+        "featured": False,
+        "description": "Imported by the benchmark",
+        "engine": "2.0L Turbo",
+        "transmission": "Automatic",
+        "fuel": "Petrol",
+        "color": "Black",
+    }
+
+
+def csv_file(rows: int) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(car(0)))
+    writer.writeheader()
+    for i in range(rows):
+        writer.writerow(car(i))
+    return buffer.getvalue().encode()
+
+
+async def run(single: int, bulk: int):
+    import httpx
+    import main
+    import models
+    from database import SessionLocal
+
+    headers = {"Authorization": f"Bearer {bench_owner_token()}"}
+    transport = httpx.ASGITransport(app=main.app)
+    # ASGITransport doesn't send lifespan events: run startup/shutdown here
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        for i in range(single):
+            body = car(i)
+            body["specs"] = {field: body.pop(field) for field in ("engine", "transmission", "fuel")}
+            (await client.post("/api/cars", json=body, headers=headers)).raise_for_status()
+        single_rate = single / (time.perf_counter() - start)
+
+        data = csv_file(bulk)
+        start = time.perf_counter()
+        response = await client.post(
+            "/api/cars/import", files={"file": ("cars.csv", data, "text/csv")}, headers=headers
+        )
+        response.raise_for_status()
+        bulk_rate = bulk / (time.perf_counter() - start)
+        report = response.json()
+
+    db = SessionLocal()
+    db.query(models.Car).filter(models.Car.name.like(f"{BENCH_NAME} %")).delete(synchronize_session=False)
+    db.commit()
+    db.close()
+
+    print(f"single POST /api/cars: {single_rate:10.1f} rows/s ({single} rows)")
+    print(f"bulk import ({report['method']:>6}): {bulk_rate:10.1f} rows/s ({report['inserted']} rows, "
+          f"{len(data) / 1e6:.1f} MB)")
+    print(f"speedup: {bulk_rate / single_rate:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--single", type=int, default=500)
+    parser.add_argument("--bulk", type=int, default=50000)
+    args = parser.parse_args()
+    asyncio.run(run(args.single, args.bulk))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# backend/test/bench_login_storm.py
+"""
+Login throughput and catalog read latency during a login storm.
+
+Runs once per password executor (PASSWORD_EXECUTOR=thread|process), each
+in its own process against the DATABASE_URL from .env, in-process through
+httpx's ASGI transport. A bench user is registered on first run.
+
+    cd backend
+    python test/bench_login_storm.py --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BENCH_USER = {
+    "email": "bench-login@example.com",
+    "username": "bench-login",
+    "password": "bench-login-password",
+    "full_name": "Login Benchmark",
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, int(len(values) * fraction) - 1)]
+
+
+async def run_storm(logins: int, concurrency: int) -> dict:
+    import httpx
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    # ASGITransport doesn't send lifespan events: run startup/shutdown here
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/api/auth/register", json=BENCH_USER)
+        form = {"username": BENCH_USER["username"], "password": BENCH_USER["password"]}
+        (await client.post("/api/auth/login", data=form)).raise_for_status()
+
+        async def read_latencies(stop: asyncio.Event):
+            latencies = []
+            while not stop.is_set():
+                start = time.perf_counter()
+                await client.get("/api/cars/featured")
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+            return latencies
+
+        # Baseline catalog latency
+        stop = asyncio.Event()
+        reader = asyncio.create_task(read_latencies(stop))
+        await asyncio.sleep(1)
+        stop.set()
+        baseline = await reader
+
+        # Login storm with concurrent catalog reads
+        semaphore = asyncio.Semaphore(concurrency)
+        statuses = []
+
+        async def login():
+            async with semaphore:
+                response = await client.post("/api/auth/login", data=form)
+                statuses.append(response.status_code)
+
+        stop = asyncio.Event()
+        reader = asyncio.create_task(read_latencies(stop))
+        start = time.perf_counter()
+        await asyncio.gather(*[login() for _ in range(logins)])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        during = await reader
+
+    return {
+        "logins_ok": statuses.count(200),
+        "logins_rejected_503": statuses.count(503),
+        "logins_per_s": round(statuses.count(200) / elapsed, 1),
+        "catalog_p99_ms_idle": round(percentile(baseline, 0.99) * 1000, 2),
+        "catalog_p99_ms_storm": round(percentile(during, 0.99) * 1000, 2),
+        "catalog_p50_ms_storm": round(statistics.median(during) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = asyncio.run(run_storm(args.logins, args.concurrency))
+        print("RESULT " + json.dumps(result))
+        return
+
+    for executor in ("thread", "process"):
+        env = dict(os.environ, PASSWORD_EXECUTOR=executor)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child",
+             "--logins", str(args.logins), "--concurrency", str(args.concurrency)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+        )
+        lines = [line for line in output.stdout.splitlines() if line.startswith("RESULT ")]
+        if not lines:
+            print(f"{executor}: failed\n{output.stdout[-2000:]}{output.stderr[-2000:]}")
+            continue
+        print(f"{executor:>8}: {lines[-1][len('RESULT '):]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# backend/test/bench_search.py
+"""
+Latency of GET /api/cars/search on a large inventory, against the
+DATABASE_URL from .env, in-process through httpx's ASGI transport with the
+catalog cache off. --cars synthetic listings are added first and deleted
+afterwards.
+
+    cd backend
+    python test/bench_search.py --cars 100000 --requests 500
+
+Measured on SQLite (FTS5 fallback, fulltext.backend "sqlite") with 100k
+listings and 500 searches: p50 18.1 ms, p99 26.2 ms. PostgreSQL not
+measured yet.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ["CATALOG_CACHE_SIZE"] = "0"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BENCH_NAME = "Bench Search"
+MODELS = ["Coupe", "Sedan", "SUV", "Estate", "Roadster", "Hatchback"]
+ENGINES = ["2.0L Turbo", "3.0L Twin-Turbo V6", "4.0L Twin-Turbo V8", "Electric", "1.6L Hybrid"]
+WORDS = ["luxury", "sport", "family", "panoramic", "roof", "leather", "adaptive", "cruise",
+         "heated", "seats", "carbon", "ceramic", "brakes", "navigation", "warranty"]
+QUERIES = ["twin-turbo coupe", "electric SUV", "hybrid estate", "carbon ceramic brakes",
+           "heated leather seats", "V8 roadster", "family sedan", "panoramic roof"]
+
+
+def insert_cars(count: int):
+    import models
+    from database import SessionLocal
+    from sqlalchemy import insert
+
+    db = SessionLocal()
+    rows = []
+    for i in range(count):
+        rows.append({
+            "name": f"{BENCH_NAME} {random.choice(MODELS)} {i}",
+            "price": random.randint(5000, 300000),
+            "year": random.randint(2000, 2024),
+            "mileage": random.randint(0, 250000),
+            "image": "https://example.com/car.jpg",
+            "featured": False,
+            "description": " ".join(random.sample(WORDS, 6)),
+            "engine": random.choice(ENGINES),
+            "transmission": random.choice(["Automatic", "Manual"]),
+            "fuel": random.choice(["Petrol", "Diesel", "Electric", "Hybrid"]),
+        })
+        if len(rows) == 5000:
+            db.execute(insert(models.Car.__table__), rows)
+            db.commit()
+            rows = []
+    if rows:
+        db.execute(insert(models.Car.__table__), rows)
+        db.commit()
+    db.close()
+
+
+def delete_cars():
+    import models
+    from database import SessionLocal
+
+    db = SessionLocal()
+    db.query(models.Car).filter(models.Car.name.like(f"{BENCH_NAME} %")).delete(synchronize_session=False)
+    db.commit()
+    db.close()
+
+
+async def run(requests: int):
+    import httpx
+    import main
+
+    latencies = []
+    transport = httpx.ASGITransport(app=main.app)
+    # ASGITransport doesn't send lifespan events: run startup/shutdown here
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(requests):
+            params = {"q": QUERIES[i % len(QUERIES)]}
+            if i % 2:
+                params["price_max"] = random.randint(20000, 200000)
+                params["year_min"] = random.randint(2000, 2020)
+            start = time.perf_counter()
+            (await client.get("/api/cars/search", params=params)).raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    print(f"{requests} searches: p50 {statistics.median(latencies) * 1000:.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cars", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    import schema
+    from database import engine
+    schema.ensure(engine)  # creates the tables and the search index
+    insert_cars(args.cars)
+    try:
+        asyncio.run(run(args.requests))
+    finally:
+        delete_cars()
+
+
+if __name__ == "__main__":
+    main()
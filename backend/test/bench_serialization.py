@@ -0,0 +1,113 @@
+# backend/test/bench_serialization.py
+"""
+Per-row CPU time and allocations of a 10k-car list response:
+ORM objects + to_dict() + CarResponse validation (old path) vs column
+rows + readmodels.CarRow + readmodels.dumps (new path).
+
+Runs against the DATABASE_URL from .env; --cars synthetic listings are
+added first and deleted afterwards.
+
+    cd backend
+    python test/bench_serialization.py --cars 10000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BENCH_NAME = "Bench Serialization"
+
+
+def insert_cars(count: int):
+    import models
+    from database import SessionLocal
+    from sqlalchemy import insert
+
+    rows = [{
+        "name": f"{BENCH_NAME} {i}", "price": 20000 + i, "year": 2000 + i % 25,
+        "mileage": i * 7 % 250000, "image": "https://example.com/car.jpg",
+        "featured": i % 10 == 0, "description": "Synthetic listing for the serialization benchmark",
+        "engine": "2.0L Turbo", "transmission": "Automatic", "fuel": "Petrol", "color": "Black",
+    } for i in range(count)]
+    db = SessionLocal()
+    db.execute(insert(models.Car.__table__), rows)
+    db.commit()
+    db.close()
+
+
+def delete_cars():
+    import models
+    from database import SessionLocal
+
+    db = SessionLocal()
+    db.query(models.Car).filter(models.Car.name.like(f"{BENCH_NAME} %")).delete(synchronize_session=False)
+    db.commit()
+    db.close()
+
+
+def old_path(db, adapter):
+    import models
+    from sqlalchemy import select
+
+    cars = db.execute(select(models.Car).where(models.Car.name.like(f"{BENCH_NAME} %"))).scalars().all()
+    body = adapter.dump_json(adapter.validate_python([car.to_dict() for car in cars]))
+    db.expunge_all()
+    return body
+
+
+def new_path(db, adapter):
+    import models
+    import readmodels
+
+    stmt = readmodels.car_select().where(models.Car.name.like(f"{BENCH_NAME} %"))
+    return readmodels.dumps(readmodels.car_rows(db.execute(stmt).all()))
+
+
+def measure(path, db, adapter, rows: int, repeat: int) -> dict:
+    path(db, adapter)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.process_time()
+        path(db, adapter)
+        timings.append(time.process_time() - start)
+
+    tracemalloc.start()
+    path(db, adapter)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"us_per_row": min(timings) / rows * 1e6, "peak_bytes_per_row": peak / rows}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cars", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    import readmodels
+    from database import SessionLocal
+    from main import CarResponse
+    from pydantic import TypeAdapter
+    from typing import List
+
+    adapter = TypeAdapter(List[CarResponse])
+    insert_cars(args.cars)
+    db = SessionLocal()
+    try:
+        assert len(old_path(db, adapter)) > 0 and len(new_path(db, adapter)) > 0
+        encoder = "orjson" if readmodels.orjson is not None else "json"
+        for label, path in (("ORM + to_dict + pydantic", old_path), (f"rows + CarRow + {encoder}", new_path)):
+            result = measure(path, db, adapter, args.cars, args.repeat)
+            print(f"{label:>26}: {result['us_per_row']:6.2f} us/row CPU, "
+                  f"{result['peak_bytes_per_row']:7.0f} B/row peak allocation")
+    finally:
+        db.close()
+        delete_cars()
+
+
+if __name__ == "__main__":
+    main()
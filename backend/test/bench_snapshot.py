@@ -0,0 +1,147 @@
+# backend/test/bench_snapshot.py
+"""
+Browse-page latency: SQL (filters + ORDER BY + LIMIT) vs the columnar
+snapshot (NumPy masks + partial argsort, then the page fetched by id),
+at several inventory sizes.
+
+Runs against the DATABASE_URL from .env; synthetic listings are added for
+each size and deleted afterwards. The snapshot is written to a temporary
+directory.
+
+    cd backend
+    python test/bench_snapshot.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+BENCH_NAME = "Bench Snapshot"
+NAMES = ["BMW X5", "Audi A4", "Tesla Model 3", "Ford Focus", "Porsche 911", "Kia Rio", "Mystery Car"]
+QUERIES = [
+    ({}, "newest"),
+    ({"price_min": 20000, "price_max": 60000}, "price-low"),
+    ({"brand": "BMW", "year_min": 2015}, "mileage-low"),
+    ({"fuel": "Diesel", "transmission": "Manual", "mileage_max": 80000}, "year-new"),
+    ({"engine_size": "large", "color": "Black"}, "price-high"),
+]
+
+
+def insert_cars(count: int):
+    import models
+    from database import SessionLocal
+    from sqlalchemy import insert
+
+    db = SessionLocal()
+    for start in range(0, count, 10000):
+        db.execute(insert(models.Car.__table__), [{
+            "name": f"{random.choice(NAMES)} {BENCH_NAME} {i}",
+            "price": random.randrange(5000, 300000, 500),
+            "year": random.randint(2000, 2024),
+            "mileage": random.randrange(0, 250000, 100),
+            "image": "https://example.com/car.jpg",
+            "featured": random.random() < 0.05,
+            "description": "Synthetic listing",
+            "engine": random.choice(["1.6L I4", "2.0L Turbo", "3.0L V6", "5.0L V8", "Electric"]),
+            "transmission": random.choice(["Automatic", "Manual"]),
+            "fuel": random.choice(["Petrol", "Diesel", "Electric", "Hybrid"]),
+            "color": random.choice(["Black", "White", "Silver", "Blue", "Red", None]),
+        } for i in range(start, min(count, start + 10000))])
+        db.commit()
+    db.close()
+
+
+def delete_cars():
+    import models
+    from database import SessionLocal
+
+    db = SessionLocal()
+    db.query(models.Car).filter(models.Car.name.like(f"% {BENCH_NAME} %")).delete(synchronize_session=False)
+    db.commit()
+    db.close()
+
+
+def sql_page(db, filters, sort):
+    import readmodels
+    import search
+
+    stmt = search.page_statement(search.apply_filters(readmodels.car_select(), filters), sort, 24)
+    return readmodels.car_rows(db.execute(stmt).all())
+
+
+def snapshot_page(db, inventory, filters, sort):
+    import models
+    import readmodels
+
+    ids = inventory.query(filters, sort, 24)
+    rows = db.execute(readmodels.car_select().where(models.Car.id.in_(ids))).all() if ids else []
+    position = {car_id: i for i, car_id in enumerate(ids)}
+    return sorted(readmodels.car_rows(rows), key=lambda car: position[car.id])
+
+
+def timed(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def run(size: int, repeat: int):
+    import search
+    import snapshot
+    from database import SessionLocal, engine
+
+    insert_cars(size)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            inventory = snapshot.InventorySnapshot(directory)
+            start = time.perf_counter()
+            inventory.build(engine)
+            build_seconds = time.perf_counter() - start
+            inventory.save()
+            start = time.perf_counter()
+            mapped = snapshot.InventorySnapshot(directory)
+            mapped.load(engine)
+            load_seconds = time.perf_counter() - start
+
+            print(f"\n{size} cars: snapshot build {build_seconds:.2f}s, mapped load {load_seconds:.2f}s")
+            db = SessionLocal()
+            for params, sort in QUERIES:
+                filters = search.CarFilters(**params)
+                sql_ids = [car.id for car in sql_page(db, filters, sort)]
+                snapshot_ids = [car.id for car in snapshot_page(db, mapped, filters, sort)]
+                assert sql_ids == snapshot_ids or "brand" in params, (params, sort)
+                sql_ms = timed(lambda: sql_page(db, filters, sort), repeat)
+                snapshot_ms = timed(lambda: snapshot_page(db, mapped, filters, sort), repeat)
+                ids_ms = timed(lambda: mapped.query(filters, sort, 24), repeat)
+                label = f"{sort} {params}"
+                print(f"  {label:<75} sql {sql_ms:8.2f} ms | snapshot {snapshot_ms:7.2f} ms "
+                      f"(ids {ids_ms:6.2f} ms)")
+            db.close()
+    finally:
+        delete_cars()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    import schema
+    from database import engine
+    schema.ensure(engine)  # creates the tables
+    for size in args.sizes:
+        run(size, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# backend/test/bench_startup.py
+"""
+Per-worker startup cost: `import main`, the lifespan startup (schema check,
+index loads) and the first request, each run in a fresh process against
+the DATABASE_URL from .env.
+
+Compares a start whose schema fingerprint matches (create_all and the
+install steps skipped) with SCHEMA_FINGERPRINT=0 (run on every start).
+
+    cd backend
+    python test/bench_startup.py --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+async def boot() -> dict:
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+    numpy_loaded = any(name.startswith("numpy.") for name in sys.modules)  # submodules only once it ran
+
+    import httpx
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        ready = time.perf_counter()
+        (await client.get("/")).raise_for_status()
+        first = time.perf_counter()
+    return {
+        "import_s": imported - started,
+        "startup_s": ready - imported,
+        "first_request_s": first - started,
+        "numpy_on_import": numpy_loaded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print("RESULT " + json.dumps(asyncio.run(boot())))
+        return
+
+    for mode, label in (("0", "always migrate"), ("1", "fingerprint")):
+        env = dict(os.environ, SCHEMA_FINGERPRINT=mode)
+        results = []
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child"],
+                cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+            )
+            lines = [line for line in output.stdout.splitlines() if line.startswith("RESULT ")]
+            if not lines:
+                print(f"{label}: failed\n{output.stdout[-2000:]}{output.stderr[-2000:]}")
+                break
+            results.append(json.loads(lines[-1][len("RESULT "):]))
+        if not results:
+            continue
+        print(f"{label:>14}: " + ", ".join(
+            f"{name} {statistics.median(r[name] for r in results) * 1000:.0f} ms"
+            for name in ("import_s", "startup_s", "first_request_s")
+        ) + f" (NumPy loaded on import: {results[0]['numpy_on_import']})")
+
+
+if __name__ == "__main__":
+    main()
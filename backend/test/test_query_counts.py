@@ -0,0 +1,114 @@
+# backend/test/test_query_counts.py
+"""
+Statements per request must not grow with the number of rows returned
+(no N+1). Each endpoint is called with 1 and with 10 rows seeded, on a
+throwaway SQLite database, counting statements with a
+before_cursor_execute listener.
+
+    cd backend
+    python -m pytest -q test/test_query_counts.py
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+DB_DIR = tempfile.mkdtemp(prefix="query-counts-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'test.db')}"
+os.environ["SNAPSHOT_DIR"] = os.path.join(DB_DIR, "snapshot")
+os.environ["CATALOG_CACHE_SIZE"] = "0"
+os.environ["PASSWORD_EXECUTOR"] = "thread"
+os.environ["RATE_LIMIT_ENABLED"] = "0"
+os.environ["WRITE_BEHIND_ENABLED"] = "0"
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from datetime import datetime, timedelta  # noqa: E402
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import delete, event  # noqa: E402
+
+import auth  # noqa: E402
+import main  # noqa: E402
+import models  # noqa: E402
+from database import SessionLocal, async_engine, engine  # noqa: E402
+
+ENDPOINTS = ["/api/user/favorites", "/api/user/test-drives", "/api/owner/test-drives"]
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def accounts(client):
+    """(user, owner) ids and tokens"""
+    db = SessionLocal()
+    try:
+        users = [
+            models.User(email=f"{role}@example.com", username=f"query-count-{role}",
+                        hashed_password="-", full_name=role, role=role)
+            for role in ("user", "owner")
+        ]
+        db.add_all(users)
+        db.commit()
+        return [(user.id, auth.create_user_token(user)) for user in users]
+    finally:
+        db.close()
+
+
+def seed(user_id: int, rows: int):
+    """Exactly `rows` cars, each a favorite of the user and with one test drive of theirs"""
+    db = SessionLocal()
+    try:
+        for model in (models.TestDrive, models.Favorite, models.Car):
+            db.execute(delete(model))
+        start = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+        for i in range(rows):
+            car = models.Car(name=f"Query Count {i}", price=10000 + i, year=2020, mileage=i,
+                             image="x", featured=False, engine="2.0L", transmission="Manual",
+                             fuel="Petrol", color="Black")
+            db.add(car)
+            db.flush()
+            db.add(models.Favorite(user_id=user_id, car_id=car.id))
+            db.add(models.TestDrive(user_id=user_id, car_id=car.id, preferred_date=start.date().isoformat(),
+                                    preferred_time="9:00 AM", slot_start=start + timedelta(hours=9),
+                                    location="Main Showroom", status="pending"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def count_statements(client, path: str, token: str) -> int:
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    targets = [engine] + ([async_engine.sync_engine] if async_engine is not None else [])
+    for target in targets:
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(path, headers={"Authorization": f"Bearer {token}"})
+    finally:
+        for target in targets:
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200, response.text
+    return len(statements)
+
+
+@pytest.mark.parametrize("path", ENDPOINTS)
+def test_statements_do_not_grow_with_rows(client, accounts, path):
+    (user_id, user_token), (_, owner_token) = accounts
+    token = owner_token if path.startswith("/api/owner/") else user_token
+
+    seed(user_id, 1)
+    one = count_statements(client, path, token)
+    seed(user_id, 10)
+    ten = count_statements(client, path, token)
+
+    assert one == ten, f"{path}: {one} statements for 1 row, {ten} for 10"
@@ -0,0 +1,217 @@
+# backend/writebehind.py
+# Write-behind queue for fire-and-forget inserts (contact inquiries): the
+# request is acknowledged once the row is queued, and a background thread
+# inserts queued rows in multi-row batches, one transaction per batch.
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+import metrics
+import models
+from log import get_logger
+
+logger = get_logger("writebehind")
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "1") == "1"
+# A batch is written after this many milliseconds or rows, whichever comes first
+WRITE_BEHIND_FLUSH_MS = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "200"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+# Rows waiting at most; beyond this submit() waits, then answers 503
+WRITE_BEHIND_MAX_DEPTH = int(os.getenv("WRITE_BEHIND_MAX_DEPTH", "10000"))
+WRITE_BEHIND_PUT_TIMEOUT = float(os.getenv("WRITE_BEHIND_PUT_TIMEOUT", "0.5"))
+# How long shutdown waits for the queue to drain
+WRITE_BEHIND_DRAIN_SECONDS = float(os.getenv("WRITE_BEHIND_DRAIN_SECONDS", "30"))
+# Delay between attempts while the database is unreachable (doubles up to 30s)
+RETRY_DELAY = 0.5
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue of row dicts for one table, flushed by a daemon thread.
+
+    - Backpressure: when WRITE_BEHIND_MAX_DEPTH rows are waiting, submit()
+      blocks for up to WRITE_BEHIND_PUT_TIMEOUT, then raises 503.
+    - Connection errors keep the batch and retry it with backoff; a batch
+      the database rejects (bad data) is retried row by row, and only the
+      rows that still fail are logged and dropped.
+    - close() (app shutdown, and atexit as a fallback) stops intake and
+      writes everything still queued before returning.
+    """
+
+    def __init__(self, name: str, table, bind=None):
+        self.name = name
+        self.table = table
+        self._bind = bind
+        self._queue = queue.Queue(maxsize=WRITE_BEHIND_MAX_DEPTH)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self._drained = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+    @property
+    def bind(self):
+        if self._bind is None:
+            from database import engine
+            self._bind = engine
+        return self._bind
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name=f"write-behind-{self.name}", daemon=True
+                    )
+                    self._thread.start()
+
+    def submit(self, row: dict):
+        """Queue a row (returns as soon as it is queued)"""
+        if self._closed:
+            raise HTTPException(status_code=503, detail="Server is shutting down, please retry")
+        self._ensure_started()
+        try:
+            self._queue.put(row, timeout=WRITE_BEHIND_PUT_TIMEOUT)
+        except queue.Full:
+            raise HTTPException(
+                status_code=503,
+                detail="We're receiving a lot of messages right now, please retry in a moment",
+                headers={"Retry-After": "1"},
+            )
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    # ----- flusher -----
+
+    def _next_batch(self) -> tuple:
+        """Up to WRITE_BEHIND_BATCH_SIZE rows, waiting at most WRITE_BEHIND_FLUSH_MS after the first"""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + WRITE_BEHIND_FLUSH_MS / 1000
+        while len(batch) < WRITE_BEHIND_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            try:
+                row = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is _STOP:
+                return batch, True
+            batch.append(row)
+        return batch, False
+
+    def _insert(self, rows: list):
+        with self.bind.begin() as conn:
+            conn.execute(insert(self.table), rows)
+
+    def _write(self, batch: list):
+        delay = RETRY_DELAY
+        while True:
+            try:
+                self._insert(batch)
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except OperationalError as e:
+                # Database unreachable: keep the rows and try again
+                logger.warning("⏳ %s write-behind: database unavailable (%s), retrying in %.1fs",
+                               self.name, e.orig, delay)
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+            except DBAPIError as e:
+                if len(batch) == 1:
+                    self.dropped += 1
+                    logger.error("❌ %s write-behind: row rejected and dropped (%s): %r",
+                                 self.name, e.orig, batch[0])
+                    return
+                # Find the bad row(s) without losing the good ones
+                for row in batch:
+                    self._write([row])
+                return
+
+    def _run(self):
+        while True:
+            batch, stop = self._next_batch()
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    self.dropped += len(batch)
+                    logger.error("❌ %s write-behind: batch of %d lost: %s", self.name, len(batch), e)
+            if stop:
+                self._drained.set()
+                return
+
+    def close(self, timeout: float = WRITE_BEHIND_DRAIN_SECONDS) -> bool:
+        """Stop accepting rows and wait until the queued ones are written"""
+        if self._closed:
+            return self._drained.is_set()
+        self._closed = True
+        if self._thread is None:
+            self._drained.set()
+            return True
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)  # after every queued row
+            drained = self._drained.wait(max(0.0, deadline - time.monotonic()))
+        except queue.Full:
+            drained = False  # full queue and a stuck writer: give up instead of hanging
+        if drained:
+            logger.info("📨 %s write-behind drained (%d rows written)", self.name, self.written)
+        else:
+            logger.error("❌ %s write-behind: %d rows still queued after %.0fs",
+                         self.name, self.depth(), timeout)
+        return drained
+
+
+contact_inquiries = WriteBehindQueue("contact_inquiries", models.ContactInquiry.__table__)
+QUEUES = [contact_inquiries]
+
+
+def submit_contact_inquiry(row: dict):
+    row.setdefault("created_at", datetime.utcnow())
+    contact_inquiries.submit(row)
+
+
+def shutdown(timeout: Optional[float] = None) -> bool:
+    """Drain every queue (app shutdown)"""
+    results = [q.close(WRITE_BEHIND_DRAIN_SECONDS if timeout is None else timeout) for q in QUEUES]
+    return all(results)
+
+
+def collect() -> list:
+    """Metrics lines for /metrics"""
+    lines = [
+        "# HELP write_behind_queue_depth Rows waiting to be written.",
+        "# TYPE write_behind_queue_depth gauge",
+    ]
+    lines += [f'write_behind_queue_depth{{queue="{q.name}"}} {q.depth()}' for q in QUEUES]
+    lines += [
+        "# HELP write_behind_rows_total Rows written by the write-behind queues.",
+        "# TYPE write_behind_rows_total counter",
+    ]
+    lines += [f'write_behind_rows_total{{queue="{q.name}"}} {q.written}' for q in QUEUES]
+    lines += [
+        "# HELP write_behind_dropped_total Rows the database rejected.",
+        "# TYPE write_behind_dropped_total counter",
+    ]
+    lines += [f'write_behind_dropped_total{{queue="{q.name}"}} {q.dropped}' for q in QUEUES]
+    return lines
+
+
+metrics.register_collector(collect)
+atexit.register(shutdown)
@@ -2,10 +2,12 @@
 import { getToken } from "./auth";
 
 const API_BASE_URL = "http://localhost:8000/api";
+// Catalog, favorites and test-drive calls send credentials: a write sets a cookie
+// that keeps the next reads on the primary database, not a lagging replica
 
 export const getAllCars = async () => {
   try {
-    const response = await fetch(`${API_BASE_URL}/cars`);
+    const response = await fetch(`${API_BASE_URL}/cars`, { credentials: "include" });
     if (!response.ok) throw new Error("Failed to fetch cars");
     return await response.json();
   } catch (error) {
@@ -16,7 +18,7 @@ export const getAllCars = async () => {
 
 export const getCarById = async (id) => {
   try {
-    const response = await fetch(`${API_BASE_URL}/cars/${id}`);
+    const response = await fetch(`${API_BASE_URL}/cars/${id}`, { credentials: "include" });
     if (!response.ok) throw new Error("Failed to fetch car");
     return await response.json();
   } catch (error) {
@@ -27,7 +29,7 @@ export const getCarById = async (id) => {
 
 export const getFeaturedCars = async () => {
   try {
-    const response = await fetch(`${API_BASE_URL}/cars/featured`);
+    const response = await fetch(`${API_BASE_URL}/cars/featured`, { credentials: "include" });
     if (!response.ok) throw new Error("Failed to fetch featured cars");
     return await response.json();
   } catch (error) {
@@ -41,6 +43,7 @@ export const createCar = async (carData) => {
   if (!token) throw new Error("Not authenticated");
 
   const response = await fetch(`${API_BASE_URL}/cars`, {
+    credentials: "include",
     method: "POST",
     headers: {
       "Content-Type": "application/json",
@@ -62,6 +65,7 @@ export const updateCar = async (id, carData) => {
   if (!token) throw new Error("Not authenticated");
 
   const response = await fetch(`${API_BASE_URL}/cars/${id}`, {
+    credentials: "include",
     method: "PUT",
     headers: {
       "Content-Type": "application/json",
@@ -83,6 +87,7 @@ export const deleteCar = async (id) => {
   if (!token) throw new Error("Not authenticated");
 
   const response = await fetch(`${API_BASE_URL}/cars/${id}`, {
+    credentials: "include",
     method: "DELETE",
     headers: {
       Authorization: `Bearer ${token}`,
@@ -161,6 +166,7 @@ export const getFavorites = async () => {
   if (!token) throw new Error("Not authenticated");
 
   const response = await fetch(`${API_BASE_URL}/user/favorites`, {
+    credentials: "include",
     headers: {
       Authorization: `Bearer ${token}`,
     },
@@ -175,6 +181,7 @@ export const addFavorite = async (carId) => {
   if (!token) throw new Error("Not authenticated");
 
   const response = await fetch(`${API_BASE_URL}/user/favorites`, {
+    credentials: "include",
     method: "POST",
     headers: {
       "Content-Type": "application/json",
@@ -196,6 +203,7 @@ export const removeFavorite = async (carId) => {
   if (!token) throw new Error("Not authenticated");
 
   const response = await fetch(`${API_BASE_URL}/user/favorites/${carId}`, {
+    credentials: "include",
     method: "DELETE",
     headers: {
       Authorization: `Bearer ${token}`,
@@ -212,6 +220,7 @@ export const getTestDrives = async () => {
   if (!token) throw new Error("Not authenticated");
 
   const response = await fetch(`${API_BASE_URL}/user/test-drives`, {
+    credentials: "include",
     headers: {
       Authorization: `Bearer ${token}`,
     },
@@ -226,6 +235,7 @@ export const requestTestDrive = async (testDriveData) => {
   if (!token) throw new Error("Not authenticated");
 
   const response = await fetch(`${API_BASE_URL}/user/test-drives`, {
+    credentials: "include",
     method: "POST",
     headers: {
       "Content-Type": "application/json",
@@ -41,6 +41,18 @@ CREATE TABLE IF NOT EXISTS cars (
 CREATE INDEX IF NOT EXISTS idx_cars_featured ON cars(featured);
 CREATE INDEX IF NOT EXISTS idx_cars_price ON cars(price);
 CREATE INDEX IF NOT EXISTS idx_cars_year ON cars(year);
+CREATE INDEX IF NOT EXISTS idx_cars_mileage ON cars(mileage);
+
+-- Full-text search (kept current by PostgreSQL on every insert/update)
+ALTER TABLE cars ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(engine, '') || ' ' ||
+                                     coalesce(transmission, '') || ' ' ||
+                                     coalesce(fuel, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'C')
+) STORED;
+CREATE INDEX IF NOT EXISTS idx_cars_search ON cars USING GIN (search_vector);
 
 -- Fourth: Create tables that depend on users and cars
 CREATE TABLE IF NOT EXISTS favorites (
@@ -60,6 +72,8 @@ CREATE TABLE IF NOT EXISTS test_drives (
     car_id INTEGER NOT NULL REFERENCES cars(id) ON DELETE CASCADE,
     preferred_date VARCHAR(100),
     preferred_time VARCHAR(100),
+    slot_start TIMESTAMP,
+    location VARCHAR(100),
     phone VARCHAR(50),
     message TEXT,
     status VARCHAR(50) DEFAULT 'pending',
@@ -68,6 +82,20 @@ CREATE TABLE IF NOT EXISTS test_drives (
 
 CREATE INDEX IF NOT EXISTS idx_test_drives_user ON test_drives(user_id);
 CREATE INDEX IF NOT EXISTS idx_test_drives_status ON test_drives(status);
+CREATE INDEX IF NOT EXISTS idx_test_drives_slot ON test_drives(slot_start);
+-- One active booking per car and slot
+CREATE UNIQUE INDEX IF NOT EXISTS uq_test_drives_car_slot ON test_drives(car_id, slot_start)
+    WHERE status IN ('pending', 'approved') AND slot_start IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS test_drive_rollups (
+    id SERIAL PRIMARY KEY,
+    period VARCHAR(10) NOT NULL,
+    bucket DATE NOT NULL,
+    car_id INTEGER NOT NULL REFERENCES cars(id) ON DELETE CASCADE,
+    status VARCHAR(50) NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    CONSTRAINT uq_test_drive_rollups_key UNIQUE (period, bucket, car_id, status)
+);
 
 CREATE TABLE IF NOT EXISTS contact_inquiries (
     id SERIAL PRIMARY KEY,
@@ -28,4 +28,16 @@ WHERE NOT EXISTS (SELECT 1 FROM cars LIMIT 1);
 -- Create indexes (idempotent)
 CREATE INDEX IF NOT EXISTS idx_cars_featured ON cars(featured);
 CREATE INDEX IF NOT EXISTS idx_cars_price ON cars(price);
-CREATE INDEX IF NOT EXISTS idx_cars_year ON cars(year);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_cars_year ON cars(year);
+CREATE INDEX IF NOT EXISTS idx_cars_mileage ON cars(mileage);
+
+-- Full-text search (kept current by PostgreSQL on every insert/update)
+ALTER TABLE cars ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(engine, '') || ' ' ||
+                                     coalesce(transmission, '') || ' ' ||
+                                     coalesce(fuel, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'C')
+) STORED;
+CREATE INDEX IF NOT EXISTS idx_cars_search ON cars USING GIN (search_vector);
\ No newline at end of file